@@ -1,13 +1,16 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, NamedTuple, Optional, Any, Tuple
+import sys
 import math
 import time
-import uuid
-import json
+import random
 import logging
+import hashlib
+from array import array
 from pathlib import Path
-from collections import defaultdict, deque
+from collections import OrderedDict, defaultdict
+from itertools import chain
 
 # Import moral rules from ethics module (single source of truth)
 try:
@@ -15,6 +18,12 @@ try:
 except ImportError:
     from ethics import S_morals
 
+# JSON encoder for reports (orjson when installed)
+try:
+    from src.jsonio import json_bytes
+except ImportError:
+    from jsonio import json_bytes
+
 # Optional imports for checkpointing (graceful degradation if not available)
 try:
     try:
@@ -45,8 +54,12 @@ class StaticRules:
     max_comp_cap: float = 99.99
     min_comp_floor: float = 0.01
     reevaluation_interval_events: int = 25              # Reval_int (by count)
+    reevaluation_min_interval_sec: float = 0.0           # also require this much wall time (0 = off)
+    reevaluation_max_defer_factor: int = 4               # ...unless Reval_int * factor events piled up
     checkpoint_interval_events: int = 50                 # Checkpoint every N events
+    checkpoint_max_defer_factor: int = 4                 # debounced checkpoints write anyway after N * factor events
     replay_buffer_size: int = 128
+    prediction_history_size: int = 10_000                # predictions retained for resolve/inspection
     reward_scale: float = 0.1                            # small continual rewards
     shadow_eval_after_events: int = 100       # how often we *may* call shadow_eval
     max_shadow_eval_runtime_sec: float = 2.0  # soft bound for safety
@@ -56,66 +69,245 @@ S_rules = StaticRules()
 
 # ----------  Sources & Skepticism  ----------
 
-@dataclass
+@dataclass(slots=True)
 class Source:
+    """A registered source. Trust lives in the owning SourceRegistry's trust column."""
     name: str
-    id: str = field(default_factory=lambda: str(uuid.uuid4()))
-    parent_id: Optional[str] = None
-    trust: float = 0.5  # 0..1; updated over time
+    id: int = -1                # dense registry-assigned id; doubles as the trust-column row
+    parent_id: Optional[int] = None
     samples: int = 0
+    _registry: Optional[SourceRegistry] = field(default=None, repr=False, compare=False)
+
+    @property
+    def trust(self) -> float:  # 0..1; updated over time
+        return self._registry.trust_of(self.id)
+
+    @trust.setter
+    def trust(self, value: float):
+        self._registry.set_trust(self.id, value)
+
+# inherited_trust blend weights for up to _MAX_HOPS parent hops
+_MAX_HOPS = 4
+_SELF_W = tuple(0.7 ** k for k in range(_MAX_HOPS + 1))   # own trust after k hops
+_PARENT_W = tuple(0.3 * 0.7 ** i for i in range(_MAX_HOPS))  # i hops below the farthest ancestor
 
 class SourceRegistry:
+    """
+    Sources plus a dense trust column.
+
+    The column stores raw values; effective trust is _scale * raw + _offset.
+    Registry-wide diffusion only updates that affine map (O(1), no pass over
+    sources), and since inherited_trust blend weights sum to 1 its memoized raw
+    blends stay valid across diffusion.
+    """
+    _RENORM_BELOW = 1e-6  # fold the affine map back into the column when _scale gets this small
+
     def __init__(self):
-        self.sources: Dict[str, Source] = {}
-    def add(self, name: str, parent_id: Optional[str] = None, base_trust: float = 0.5) -> str:
-        s = Source(name=name, parent_id=parent_id, trust=base_trust)
+        self.sources: Dict[int, Source] = {}
+        self.name_to_id: Dict[str, int] = {}  # reverse index for O(1) name lookups
+        self._trust = array("d")  # dense raw-trust column, indexed by source id
+        self._scale = 1.0
+        self._offset = 0.0
+        self._inh_cache: Dict[int, float] = {}  # memoized raw inherited blends, cleared on trust changes
+    def add(self, name: str, parent_id: Optional[int] = None, base_trust: float = 0.5) -> int:
+        # ids are assigned per registry (not from a global counter) so they stay
+        # unique after a checkpoint is restored into a fresh process
+        name = sys.intern(name)  # the registry's copy is the one every lookup compares against
+        s = Source(name=name, id=len(self._trust), parent_id=parent_id, _registry=self)
+        self._trust.append((base_trust - self._offset) / self._scale)
         self.sources[s.id] = s
+        self.name_to_id[name] = s.id
+        self.invalidate_trust_cache()  # a new source may become someone's parent
         return s.id
-    def get(self, sid: str) -> Source:
+    def trust_of(self, sid: int) -> float:
+        return self._scale * self._trust[sid] + self._offset
+    def set_trust(self, sid: int, value: float):
+        self._trust[sid] = (value - self._offset) / self._scale
+        self.invalidate_trust_cache()
+    def diffuse_trust(self, rate: float = 0.1, target: float = 0.5):
+        """Nudge every source's trust toward target (t = (1-rate)*t + rate*target) in O(1)."""
+        keep = 1.0 - rate
+        self._scale *= keep
+        self._offset = keep * self._offset + rate * target
+        if self._scale < self._RENORM_BELOW:
+            # materialize once in a long while to keep raw values well-conditioned
+            scale, offset = self._scale, self._offset
+            self._trust = array("d", [scale * t + offset for t in self._trust])
+            self._scale, self._offset = 1.0, 0.0
+            self.invalidate_trust_cache()
+    def invalidate_trust_cache(self):
+        """Drop memoized inherited_trust values; call after any trust mutation."""
+        self._inh_cache.clear()
+    def get(self, sid: int) -> Source:
         return self.sources[sid]
-    def inherited_trust(self, sid: str) -> float:
-        s = self.sources[sid]
-        t = s.trust
-        hops = 0
-        while s.parent_id and s.parent_id in self.sources and hops < 4:
-            s = self.sources[s.parent_id]
-            t = 0.7 * t + 0.3 * s.trust  # blend with parent trust
-            hops += 1
-        return t
+    def get_by_name(self, name: str) -> Optional[int]:
+        return self.name_to_id.get(name)
+    def get_or_add(self, name: str, parent_id: Optional[int] = None, base_trust: float = 0.5) -> int:
+        """Return the id registered for name, registering it first if new."""
+        sid = self.name_to_id.get(name)
+        return self.add(name, parent_id=parent_id, base_trust=base_trust) if sid is None else sid
+    # Pickle as parallel columns (one bytes blob per numeric field) rather than
+    # one object per source; Source objects and the name index are rebuilt on load.
+    def __getstate__(self):
+        srcs = [self.sources[i] for i in range(len(self._trust))]
+        return {
+            "name": [s.name for s in srcs],
+            "parent_id": array("q", [-1 if s.parent_id is None else s.parent_id for s in srcs]),
+            "samples": array("q", [s.samples for s in srcs]),
+            "trust": self._trust,
+            "scale": self._scale,
+            "offset": self._offset,
+        }
+    def __setstate__(self, state):
+        self.__init__()
+        self._trust = array("d", state["trust"])
+        self._scale, self._offset = state["scale"], state["offset"]
+        for sid, (name, pid, samples) in enumerate(zip(state["name"], state["parent_id"], state["samples"])):
+            self.sources[sid] = Source(name=name, id=sid, parent_id=None if pid < 0 else pid,
+                                       samples=samples, _registry=self)
+            self.name_to_id[name] = sid
+    def inherited_trust(self, sid: int) -> float:
+        cached = self._inh_cache.get(sid)
+        if cached is not None:
+            return self._scale * cached + self._offset
+        # gather up to _MAX_HOPS ancestor trusts, nearest first
+        trust, sources = self._trust, self.sources
+        parents = []
+        pid = sources[sid].parent_id
+        while pid is not None and pid in sources and len(parents) < _MAX_HOPS:
+            parents.append(trust[pid])
+            pid = sources[pid].parent_id
+        # closed form of repeated t = 0.7*t + 0.3*parent: the farthest ancestor
+        # gets 0.3, each nearer one another factor of 0.7
+        k = len(parents)
+        t = _SELF_W[k] * trust[sid]
+        for w, p in zip(_PARENT_W, reversed(parents)):
+            t += w * p
+        self._inh_cache[sid] = t
+        return self._scale * t + self._offset
 
 # ----------  Knowledge Base  ----------
 
-@dataclass
+@dataclass(slots=True)
 class Claim:
     subject: str
     info: Any
     label: Optional[Any] = None  # ground truth if known
-    source_ids: List[str] = field(default_factory=list)
+    source_ids: List[int] = field(default_factory=list)
     own: bool = False            # Own_ideas marker
     timestamp: float = field(default_factory=time.time)
 
+class ClaimTable:
+    """
+    Structure-of-arrays store for claims.
+
+    Numeric fields live in contiguous typed columns; subject/info/label stay in
+    plain lists. Source id lists are stored CSR-style: one flat id column plus
+    row offsets. Indexing returns a Claim snapshot (read-view).
+    """
+    def __init__(self):
+        self.subject: List[str] = []
+        self.info: List[Any] = []
+        self.label: List[Optional[Any]] = []
+        self.source_ids = array("q")          # all claims' source ids, back to back
+        self.source_start = array("q", [0])   # row i owns source_ids[source_start[i]:source_start[i+1]]
+        self.own = array("b")
+        self.timestamp = array("d")
+    def append(self, c: Claim) -> int:
+        idx = len(self.subject)
+        self.subject.append(c.subject)
+        self.info.append(c.info)
+        self.label.append(c.label)
+        self.source_ids.extend(c.source_ids)
+        self.source_start.append(len(self.source_ids))
+        self.own.append(c.own)
+        self.timestamp.append(c.timestamp)
+        return idx
+    def extend(self, subjects: List[str], infos: List[Any], labels: List[Optional[Any]],
+               source_id_rows: List[List[int]], own: bool, timestamp: float) -> range:
+        """Append many claims sharing `own` and `timestamp`, one column at a time."""
+        start = len(self.subject)
+        n = len(subjects)
+        self.subject.extend(subjects)
+        self.info.extend(infos)
+        self.label.extend(labels)
+        ids, row_start = self.source_ids, self.source_start
+        for row in source_id_rows:
+            ids.extend(row)
+            row_start.append(len(ids))
+        self.own.extend(array("b", [own]) * n)
+        self.timestamp.extend(array("d", [timestamp]) * n)
+        return range(start, start + n)
+    def __len__(self) -> int:
+        return len(self.subject)
+    def __getitem__(self, idx: int) -> Claim:
+        if idx < 0:
+            idx += len(self.subject)
+        start, stop = self.source_start[idx], self.source_start[idx + 1]
+        return Claim(
+            subject=self.subject[idx],
+            info=self.info[idx],
+            label=self.label[idx],
+            source_ids=self.source_ids[start:stop].tolist(),
+            own=bool(self.own[idx]),
+            timestamp=self.timestamp[idx],
+        )
+    def __iter__(self):
+        return (self[i] for i in range(len(self.subject)))
+
 class KnowledgeBase:
     def __init__(self):
-        self.claims: List[Claim] = []
+        self.claims = ClaimTable()
         self.by_subject: Dict[str, List[int]] = defaultdict(list)
     def add(self, c: Claim) -> int:
-        idx = len(self.claims)
-        self.claims.append(c)
+        idx = self.claims.append(c)
         self.by_subject[c.subject].append(idx)
         return idx
+    def add_batch(self, subjects: List[str], infos: List[Any], labels: List[Optional[Any]],
+                  source_id_rows: List[List[int]], own: bool, timestamp: float) -> range:
+        rows = self.claims.extend(subjects, infos, labels, source_id_rows, own, timestamp)
+        by_subject = self.by_subject
+        for idx, subject in zip(rows, subjects):
+            by_subject[subject].append(idx)
+        return rows
+    def count(self, subject: str) -> int:
+        return len(self.by_subject.get(subject, ()))
+    def iter_subject(self, subject: str):
+        claims = self.claims
+        for i in self.by_subject.get(subject, ()):
+            yield claims[i]
     def subject_items(self, subject: str) -> List[Claim]:
-        return [self.claims[i] for i in self.by_subject.get(subject, [])]
+        return list(self.iter_subject(subject))
+    # The claim table is already columnar; by_subject is derived from its
+    # subject column, so it is rebuilt on load rather than pickled.
+    def __getstate__(self):
+        return {"claims": self.claims}
+    def __setstate__(self, state):
+        self.__init__()
+        self.claims = claims = state["claims"]
+        by_subject = self.by_subject
+        for i, subject in enumerate(claims.subject):
+            by_subject[subject].append(i)
 
 # ----------  Generalized Knowledge (GK)  ----------
 # Simple, explainable priors: frequency counts and EWMA outcome rates.
 
-@dataclass
+_NEUTRAL_PRIOR = 0.5  # prior for a subject with no observations yet
+
+@dataclass(slots=True)
 class GKEntry:
     count: int = 0
-    ewma_value: float = 0.5     # prior probability for binary-ish outcomes
+    ewma_value: float = _NEUTRAL_PRIOR  # prior probability for binary-ish outcomes
     ewma_alpha: float = 0.1
+    skip_budget: int = 0        # converged observations that may skip the blend
 
 class GeneralizedKnowledge:
+    # Once the EWMA sits within STABLE_EPS of an observation, blending it in moves
+    # the prior by less than alpha * STABLE_EPS; up to SKIP_BUDGET such observations
+    # are only counted. The prior never drifts more than STABLE_EPS from the exact EWMA.
+    STABLE_EPS = 1e-3
+    SKIP_BUDGET = 32
+
     def __init__(self):
         self.per_subject: Dict[str, GKEntry] = defaultdict(GKEntry)
     def update_with_observation(self, subject: str, numeric_outcome: Optional[float]):
@@ -123,30 +315,141 @@ class GeneralizedKnowledge:
             return
         g = self.per_subject[subject]
         g.count += 1
-        g.ewma_value = (1 - g.ewma_alpha) * g.ewma_value + g.ewma_alpha * float(numeric_outcome)
+        x = float(numeric_outcome)
+        if g.skip_budget and abs(x - g.ewma_value) < self.STABLE_EPS:
+            g.skip_budget -= 1
+            return
+        g.ewma_value = (1 - g.ewma_alpha) * g.ewma_value + g.ewma_alpha * x
+        g.skip_budget = self.SKIP_BUDGET
+    def update_batch(self, subject: str, numeric_outcomes: List[float]):
+        """Apply several observations at once; same result as sequential updates."""
+        if not numeric_outcomes:
+            return
+        g = self.per_subject[subject]
+        alpha = g.ewma_alpha
+        keep = 1 - alpha
+        eps = self.STABLE_EPS
+        v, budget = g.ewma_value, g.skip_budget
+        for x in numeric_outcomes:
+            if budget and abs(x - v) < eps:
+                budget -= 1
+                continue
+            v = keep * v + alpha * x
+            budget = self.SKIP_BUDGET
+        g.count += len(numeric_outcomes)
+        g.ewma_value, g.skip_budget = v, budget
     def prior(self, subject: str) -> float:
-        return self.per_subject[subject].ewma_value
+        # ewma_value is the prior itself, maintained incrementally by the updates, so
+        # there is nothing to recompute; .get keeps lookups of unseen subjects from
+        # inserting empty entries into per_subject
+        g = self.per_subject.get(subject)
+        return _NEUTRAL_PRIOR if g is None else g.ewma_value
 
 # ----------  Subject Progress / Completion  ----------
 
+# prediction gates in completion-% units, fixed for the lifetime of S_rules
+_EXT_GATE = S_rules.external_prediction_after * 100.0
+_INT_GATE = S_rules.allow_self_generated_scenarios_after * 100.0
+
+_COMP_FLOOR = S_rules.min_comp_floor
+_COMP_CAP = S_rules.max_comp_cap
+_K_MAX = 0.06 + 0.01 * 10   # completion rate once 10+ distinct sources are seen
+
+class SourceCardinality:
+    """
+    Distinct-source counter with bounded memory.
+
+    Exact (a small set) until EXACT_LIMIT ids have been seen, which covers the
+    diversity range that affects completion and bias checks; beyond that it
+    switches to a 64-register HyperLogLog estimate (~13% std. error).
+    """
+    EXACT_LIMIT = 16
+    _M = 64                       # HLL registers
+    _ALPHA = 0.709                # bias correction for m = 64
+
+    def __init__(self):
+        self._exact: Optional[set] = set()
+        self._registers: Optional[bytearray] = None
+
+    @staticmethod
+    def _hash64(sid: Any) -> int:
+        # process-stable hash so estimates survive checkpoint/restore
+        return int.from_bytes(hashlib.blake2b(repr(sid).encode(), digest_size=8).digest(), "little")
+
+    def _add_hll(self, sid: Any):
+        h = self._hash64(sid)
+        j = h & (self._M - 1)
+        w = h >> 6                                  # remaining 58 bits
+        rank = 58 - w.bit_length() + 1              # position of leftmost 1-bit
+        if rank > self._registers[j]:
+            self._registers[j] = rank
+
+    def update(self, source_ids):
+        if self._exact is not None:
+            self._exact.update(source_ids)
+            if len(self._exact) <= self.EXACT_LIMIT:
+                return
+            # promote to HyperLogLog, seeding it with everything seen so far
+            self._registers = bytearray(self._M)
+            source_ids, self._exact = self._exact, None
+        for sid in source_ids:
+            self._add_hll(sid)
+
+    def __len__(self) -> int:
+        if self._exact is not None:
+            return len(self._exact)
+        m = self._M
+        estimate = self._ALPHA * m * m / sum(2.0 ** -r for r in self._registers)
+        zeros = self._registers.count(0)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)      # small-range correction
+        return max(self.EXACT_LIMIT + 1, int(round(estimate)))
+
 @dataclass
 class SubjectProgress:
     seen_items: int = 0
-    distinct_sources: set = field(default_factory=set)
+    distinct_sources: SourceCardinality = field(default_factory=SourceCardinality)
     completion_percent: float = 0.01  # start floor
-    def update(self, new_source_ids: List[str]):
+    ext_ok: bool = False              # completion_percent >= external prediction gate
+    int_ok: bool = False              # completion_percent >= internal scenario gate
+    # cached exp(-k) and exp(-k * seen_items) so steady-state updates avoid math.exp
+    _k: float = field(default=0.0, repr=False)
+    _exp_neg_k: float = field(default=1.0, repr=False)
+    _exp_neg_kn: float = field(default=1.0, repr=False)
+    def update(self, new_source_ids: List[int]):
         self.seen_items += 1
         self.distinct_sources.update(new_source_ids)
+        self._refresh_completion(1)
+    def update_batch(self, new_source_ids: List[int], n_items: int):
+        """Register n_items claims at once and recompute completion a single time."""
+        self.seen_items += n_items
+        self.distinct_sources.update(new_source_ids)
+        self._refresh_completion(n_items)
+    def _refresh_completion(self, n_new: int):
         # naive heuristic: approach cap as items and sources diversify
-        diversity = len(self.distinct_sources)
         # saturating function (1 - exp(-k*n)); k diminishes the growth rate
-        k = 0.06 + 0.01 * min(diversity, 10)
-        approx = (1 - math.exp(-k * self.seen_items)) * 100.0
-        self.completion_percent = max(S_rules.min_comp_floor, min(S_rules.max_comp_cap, approx))
+        if self._k < _K_MAX:
+            diversity = len(self.distinct_sources)
+            k = 0.06 + 0.01 * (diversity if diversity < 10 else 10)
+        else:
+            k = _K_MAX  # diversity only grows, so k is frozen once saturated
+        if k != self._k:
+            self._k = k
+            self._exp_neg_k = math.exp(-k)
+            self._exp_neg_kn = math.exp(-k * self.seen_items)
+        elif n_new == 1:
+            self._exp_neg_kn *= self._exp_neg_k
+        else:
+            self._exp_neg_kn *= self._exp_neg_k ** n_new
+        approx = (1.0 - self._exp_neg_kn) * 100.0
+        comp = _COMP_FLOOR if approx < _COMP_FLOOR else (_COMP_CAP if approx > _COMP_CAP else approx)
+        self.completion_percent = comp
+        self.ext_ok = comp >= _EXT_GATE
+        self.int_ok = comp >= _INT_GATE
 
 # ----------  Prediction & Evaluation  ----------
 
-@dataclass
+@dataclass(slots=True)
 class PredictionRecord:
     subject: str
     scenario: Any
@@ -157,11 +460,99 @@ class PredictionRecord:
     correct: Optional[bool] = None
     brier: Optional[float] = None
 
+class PredictionTable:
+    """
+    Structure-of-arrays store for prediction history.
+
+    Numeric fields live in contiguous typed columns; subject/scenario stay in
+    plain lists. Rows form a ring of `capacity` entries: indices are absolute
+    (0, 1, 2, ... over the agent's lifetime) and stay valid until the row is
+    overwritten capacity predictions later. Indexing returns a PredictionRecord
+    snapshot (read-view).
+    """
+    def __init__(self, capacity: int = 10_000):
+        self.capacity = capacity
+        self.total = 0              # predictions ever logged (next absolute index)
+        self.subject: List[str] = []
+        self.scenario: List[Any] = []
+        self.prob = array("d")
+        self.own = array("b")
+        self.timestamp = array("d")
+        self.resolved = array("b")
+        self.correct = array("b")   # -1 = unknown, 0/1 once resolved
+        self.observed = array("b")  # -1 = unknown, observed outcome once resolved
+        self.brier = array("d")     # NaN until resolved
+    def append(self, p: PredictionRecord) -> int:
+        idx = self.total
+        self.total += 1
+        row = (p.subject, p.scenario, p.prob, p.own, p.timestamp, p.resolved,
+               -1 if p.correct is None else p.correct, -1,
+               math.nan if p.brier is None else p.brier)
+        columns = (self.subject, self.scenario, self.prob, self.own, self.timestamp,
+                   self.resolved, self.correct, self.observed, self.brier)
+        if idx < self.capacity:
+            for col, value in zip(columns, row):
+                col.append(value)
+        else:
+            slot = idx % self.capacity  # overwrite the oldest row
+            for col, value in zip(columns, row):
+                col[slot] = value
+        return idx
+    def slot(self, idx: int) -> int:
+        """Map an absolute prediction index to its column row."""
+        if idx < 0:
+            idx += self.total
+        if not (self.total - len(self.prob) <= idx < self.total):
+            raise IndexError(f"prediction {idx} is out of range or evicted from history")
+        return idx % self.capacity
+    def __len__(self) -> int:
+        return len(self.prob)  # rows retained (<= capacity)
+    def __getitem__(self, idx: int) -> PredictionRecord:
+        i = self.slot(idx)
+        correct = self.correct[i]
+        brier = self.brier[i]
+        return PredictionRecord(
+            subject=self.subject[i],
+            scenario=self.scenario[i],
+            prob=self.prob[i],
+            own=bool(self.own[i]),
+            timestamp=self.timestamp[i],
+            resolved=bool(self.resolved[i]),
+            correct=None if correct < 0 else bool(correct),
+            brier=None if brier != brier else brier,
+        )
+    def __iter__(self):
+        """Retained records, oldest first."""
+        return (self[i] for i in range(self.total - len(self.prob), self.total))
+
+def _outcome(observed) -> int:
+    """Validate a binary outcome (0/1, 0.0/1.0 or bool) and return it as an int."""
+    if observed not in (0, 1):
+        raise ValueError(f"observed outcome must be 0 or 1, got {observed!r}")
+    return int(observed)
+
+def _score(prob: float, observed: int) -> Tuple[bool, float]:
+    """(correct, Brier score) for one binary prediction resolved as observed (0/1)."""
+    d = prob - observed
+    return (observed == 1 and prob >= 0.5) or (observed == 0 and prob < 0.5), d * d
+
+CALIBRATION_WINDOW = 256  # number of recent resolutions used for mean Brier
+
 class Predictor:
     def __init__(self, gk: GeneralizedKnowledge):
         self.gk = gk
-        self.history: List[PredictionRecord] = []
-        self.calibration_window: deque = deque(maxlen=256)
+        self.history = PredictionTable(S_rules.prediction_history_size)
+        # fixed-size ring of recent Brier scores with a running sum (O(1) mean)
+        self._brier_ring = array("d", bytes(8 * CALIBRATION_WINDOW))
+        self._ring_head = 0
+        self._ring_count = 0
+        self._brier_sum = 0.0
+        # predict-time shaping bonus; mean_brier only moves on resolve, so cache it there
+        self.calibration_bonus = 0.0
+        # lifetime counters so reports never rescan history
+        self.resolved_count = 0
+        self.correct_count = 0
+        self.brier_sum = 0.0
     def predict(self, subject: str, scenario: Any, extra_evidence: Optional[float]) -> float:
         # Combine GK prior with simple evidence via a convex blend
         prior = self.gk.prior(subject)
@@ -169,26 +560,91 @@ class Predictor:
             return prior
         w = 0.35  # how much we trust the new evidence
         return max(0.01, min(0.99, (1 - w) * prior + w * extra_evidence))
-    def log_prediction(self, p: PredictionRecord):
-        self.history.append(p)
+    def log_prediction(self, p: PredictionRecord) -> int:
+        return self.history.append(p)
     def resolve(self, idx: int, observed: int):
         # observed should be 0/1 for this toy; adapt as needed
-        p = self.history[idx]
-        if p.resolved:
+        observed = _outcome(observed)
+        h = self.history
+        i = h.slot(idx)
+        if h.resolved[i]:
             return
-        p.resolved = True
-        p.correct = (observed == 1 and p.prob >= 0.5) or (observed == 0 and p.prob < 0.5)
-        p.brier = (p.prob - observed) ** 2
-        self.calibration_window.append(p.brier)
+        correct, brier = _score(h.prob[i], observed)
+        h.resolved[i] = 1
+        h.correct[i] = correct
+        h.observed[i] = observed
+        h.brier[i] = brier
+        self.resolved_count += 1
+        self.correct_count += correct
+        self.brier_sum += brier
+        self._push_brier(brier)
+        self.calibration_bonus = max(0.0, 0.25 - self.mean_brier()) * S_rules.reward_scale
+
+    def resolve_batch(self, indices: List[int], observed: List[int]) -> int:
+        """
+        Resolve many predictions at once; counters and the calibration bonus are
+        updated once for the batch. Already-resolved indices are skipped.
+        Every index and outcome is validated before anything is written, so a
+        bad entry (IndexError / ValueError) leaves the whole batch unresolved.
+        Returns the number of predictions newly resolved.
+        """
+        if len(indices) != len(observed):
+            raise ValueError("resolve_batch: indices and observed must have equal length")
+        h = self.history
+        slots = [h.slot(idx) for idx in indices]
+        observed = [_outcome(obs) for obs in observed]
+        resolved, prob_col, correct_col, brier_col = h.resolved, h.prob, h.correct, h.brier
+        observed_col = h.observed
+        push = self._push_brier
+        n = n_correct = 0
+        brier_total = 0.0
+        for i, obs in zip(slots, observed):
+            if resolved[i]:
+                continue
+            correct, brier = _score(prob_col[i], obs)
+            resolved[i] = 1
+            correct_col[i] = correct
+            observed_col[i] = obs
+            brier_col[i] = brier
+            push(brier)
+            n += 1
+            n_correct += correct
+            brier_total += brier
+        if n:
+            self.resolved_count += n
+            self.correct_count += n_correct
+            self.brier_sum += brier_total
+            self.calibration_bonus = max(0.0, 0.25 - self.mean_brier()) * S_rules.reward_scale
+        return n
+
+    def _push_brier(self, brier: float):
+        ring, head = self._brier_ring, self._ring_head
+        if self._ring_count == CALIBRATION_WINDOW:
+            self._brier_sum -= ring[head]  # evict oldest
+        else:
+            self._ring_count += 1
+        ring[head] = brier
+        self._brier_sum += brier
+        head = (head + 1) % CALIBRATION_WINDOW
+        self._ring_head = head
+        if head == 0:
+            # re-sum once per lap so float drift in the running sum stays bounded
+            self._brier_sum = math.fsum(ring)
 
     def mean_brier(self) -> Optional[float]:
-        if not self.calibration_window:
+        if not self._ring_count:
+            return None
+        return self._brier_sum / self._ring_count
+
+    def lifetime_mean_brier(self) -> Optional[float]:
+        """Mean Brier score over every resolved prediction (not just the calibration window)."""
+        if not self.resolved_count:
             return None
-        return sum(self.calibration_window) / len(self.calibration_window)
+        return self.brier_sum / self.resolved_count
 
 # ----------  Replay Buffer  ----------
 
-@dataclass
+@dataclass(slots=True)
 class ReplayEvent:
     kind: str                 # 'ingest', 'predict', 'resolve'
     subject: str
@@ -197,15 +653,172 @@ class ReplayEvent:
     correct: Optional[bool] = None     # for resolve
     timestamp: float = field(default_factory=time.time)
 
-# Helper function for pattern stats (must be at module level for pickleability)
-def _new_pattern_stat() -> Dict[str, Any]:
-    """Create a new pattern stat dict (pickleable function)"""
-    return {
-        "events": 0,
-        "disagreements": 0,
-        "last_label": None,
-        "last_seen": 0.0,
-    }
+@dataclass(slots=True)
+class MergedTransition:
+    """Replay entry standing for `count` near-identical ReplayEvents (see ReplayMap)."""
+    kind: str
+    subject: str
+    label: Optional[float] = None
+    prob: Optional[float] = None       # running mean over the merged events
+    correct: Optional[bool] = None
+    count: int = 1
+    first_seen: float = 0.0
+    last_seen: float = 0.0
+
+class ReplayMap:
+    """
+    Bounded replay buffer that merges near-duplicate events instead of appending them.
+
+    Events with the same kind, subject, label and correctness whose prob falls
+    in the same PROB_BUCKET-wide bin collapse into one MergedTransition
+    (count, running-mean prob, last_seen). Entries are kept least recently
+    seen first; beyond maxlen distinct entries the stalest is evicted, so the
+    cap bounds distinct situations rather than raw events. Iteration yields
+    entries stalest first.
+    """
+    PROB_BUCKET = 0.05
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self._entries: OrderedDict[tuple, MergedTransition] = OrderedDict()
+    def append(self, e: ReplayEvent):
+        entries = self._entries
+        bucket = -1 if e.prob is None else round(e.prob / self.PROB_BUCKET)
+        key = (e.kind, e.subject, e.label, e.correct, bucket)
+        m = entries.get(key)
+        if m is None:
+            entries[key] = MergedTransition(e.kind, e.subject, e.label, e.prob, e.correct,
+                                            1, e.timestamp, e.timestamp)
+            if len(entries) > self.maxlen:
+                entries.popitem(last=False)
+        else:
+            m.count += 1
+            if e.prob is not None:
+                m.prob += (e.prob - m.prob) / m.count
+            m.last_seen = e.timestamp
+            entries.move_to_end(key)
+    def extend(self, events):
+        for e in events:
+            self.append(e)
+    def __len__(self) -> int:
+        return len(self._entries)
+    def __iter__(self):
+        return iter(self._entries.values())
+    def sample(self, k: int, rng: Optional[random.Random] = None) -> List[MergedTransition]:
+        """
+        Draw k entries with replacement, weighted by how many events each merged,
+        so samples follow the raw event distribution. Counts are kept per entry on
+        append; the weights are only gathered here, when a sample is requested.
+        """
+        entries = list(self._entries.values())
+        if not entries:
+            return []
+        return (rng or random).choices(entries, weights=[m.count for m in entries], k=k)
+    # Pickle as parallel columns; None is encoded as NaN (floats) or -1 (flags/bins).
+    def __getstate__(self):
+        keys, entries = list(self._entries), list(self._entries.values())
+        return {
+            "maxlen": self.maxlen,
+            "kind": [m.kind for m in entries],
+            "subject": [m.subject for m in entries],
+            "label": array("d", [math.nan if m.label is None else m.label for m in entries]),
+            "prob": array("d", [math.nan if m.prob is None else m.prob for m in entries]),
+            "bucket": array("q", [k[4] for k in keys]),
+            "correct": array("b", [-1 if m.correct is None else m.correct for m in entries]),
+            "count": array("q", [m.count for m in entries]),
+            "first_seen": array("d", [m.first_seen for m in entries]),
+            "last_seen": array("d", [m.last_seen for m in entries]),
+        }
+    def __setstate__(self, state):
+        self.__init__(state["maxlen"])
+        entries = self._entries
+        for kind, subject, label, prob, bucket, correct, count, first, last in zip(
+                state["kind"], state["subject"], state["label"], state["prob"], state["bucket"],
+                state["correct"], state["count"], state["first_seen"], state["last_seen"]):
+            label = None if label != label else label
+            correct = None if correct < 0 else bool(correct)
+            entries[(kind, subject, label, correct, bucket)] = MergedTransition(
+                kind, subject, label, None if prob != prob else prob, correct, count, first, last)
+
+# ----------  Reporting  ----------
+
+class SubjectReport(NamedTuple):
+    """Per-subject snapshot; values are unrounded (formatting is left to the caller)."""
+    subject: str
+    completion_percent: float
+    items: int
+    distinct_sources: int
+    gk_prior: float
+
+# ----------  Pattern Stats  ----------
+
+@dataclass(slots=True)
+class PatternStat:
+    """Per-subject disagreement counters (snapshot returned by PatternTable)."""
+    events: int = 0
+    disagreements: int = 0
+    last_label: Optional[Any] = None
+    last_seen: float = 0.0
+
+class PatternTable:
+    """
+    Columnar per-subject disagreement counters.
+
+    Each subject gets a row on its first update; counters live in contiguous
+    typed columns (last_label is NaN until a numeric label is seen). Indexing
+    by subject returns a PatternStat snapshot (read-view); subjects never
+    recorded read as an empty PatternStat.
+    """
+    def __init__(self):
+        self.row: Dict[str, int] = {}
+        self.events = array("q")
+        self.disagreements = array("q")
+        self.last_label = array("d")
+        self.last_seen = array("d")
+    def _row(self, subject: str) -> int:
+        i = self.row.get(subject)
+        if i is None:
+            i = self.row[subject] = len(self.events)
+            self.events.append(0)
+            self.disagreements.append(0)
+            self.last_label.append(math.nan)
+            self.last_seen.append(0.0)
+        return i
+    def record(self, subject: str, numeric_label: Optional[float], now: float):
+        i = self._row(subject)
+        self.events[i] += 1
+        self.last_seen[i] = now
+        if numeric_label is not None:
+            last = self.last_label[i]
+            if last == last and last != numeric_label:  # NaN: no earlier label
+                self.disagreements[i] += 1
+            self.last_label[i] = numeric_label
+    def record_batch(self, subject: str, numeric_labels: List[Optional[float]], now: float):
+        """Same result as record() for each label in order, with one row lookup."""
+        i = self._row(subject)
+        last, flips = self.last_label[i], 0
+        for label in numeric_labels:
+            if label is not None:
+                if last == last and last != label:
+                    flips += 1
+                last = label
+        self.events[i] += len(numeric_labels)
+        self.disagreements[i] += flips
+        self.last_label[i] = last
+        self.last_seen[i] = now
+    def __len__(self) -> int:
+        return len(self.row)
+    def __contains__(self, subject: str) -> bool:
+        return subject in self.row
+    def __iter__(self):
+        return iter(self.row)
+    def __getitem__(self, subject: str) -> PatternStat:
+        i = self.row.get(subject)
+        if i is None:
+            return PatternStat()
+        last = self.last_label[i]
+        return PatternStat(self.events[i], self.disagreements[i],
+                           None if last != last else last, self.last_seen[i])
 
 # ----------  Continuous Learner Orchestrator  ----------
 
@@ -218,6 +831,7 @@ class ContinuousLearner:
         self.progress: Dict[str, SubjectProgress] = defaultdict(SubjectProgress)
         self.event_count = 0
         self.last_reeval_event = 0
+        self._last_reeval_ts = time.monotonic()
         self.last_checkpoint_event = 0
         self.total_reward = 0.0
         # Bias logs / cross-links
@@ -228,9 +842,11 @@ class ContinuousLearner:
         self.enable_logging = enable_logging
         self.enable_checkpoints = enable_checkpoints and CHECKPOINT_AVAILABLE
         self.log_path = Path("logs/journal.log")
-        self.replay: deque[ReplayEvent] = deque(maxlen=S_rules.replay_buffer_size)
-        # simple per-subject pattern stats (using function for pickleability)
-        self.pattern_stats: Dict[str, Dict[str, Any]] = defaultdict(_new_pattern_stat)
+        self.replay = ReplayMap(S_rules.replay_buffer_size)
+        # simple per-subject pattern stats
+        self.pattern_stats = PatternTable()
+        # subjects ingested since the last reflection (dict as an insertion-ordered set)
+        self._dirty_subjects: Dict[str, None] = {}
 
         # Initialize logger
         if self.enable_logging:
@@ -245,68 +861,160 @@ class ContinuousLearner:
         else:
             self.logger = None
 
+    # --- Pickling ---
+    # Components pickle themselves as columns. A lazily restored learner (see
+    # checkpoint.LazySections) holds its not-yet-loaded components in
+    # _lazy_sections; they are loaded on first attribute access, and all of
+    # them before the learner is pickled again.
+    def __getattr__(self, name):
+        # only reached when normal lookup fails
+        lazy = self.__dict__.get("_lazy_sections")
+        if lazy is None or name not in lazy:
+            raise AttributeError(f"{type(self).__name__!r} object has no attribute {name!r}")
+        return lazy.load(name)
+
+    def __getstate__(self):
+        lazy = self.__dict__.get("_lazy_sections")
+        if lazy is not None:
+            lazy.load_all()
+        return self.__dict__.copy()
+
     # --- Guardrails / Morals ---
-    def enforce_guardrails(self, action_desc: str) -> None:
-        # In this prototype we only simulate non-harmful read/eval.
-        if not S_morals.never_harm_living:
+    # S_morals is frozen, so the moral-core check is partially evaluated once when
+    # the class is built and the hot-path method is specialized accordingly.
+    # Expand with domain checks if you add actions/experiments later.
+    if S_morals.never_harm_living:
+        def enforce_guardrails(self, action_desc: str) -> None:
+            # In this prototype we only simulate non-harmful read/eval.
+            return None
+    else:
+        def enforce_guardrails(self, action_desc: str) -> None:
             raise RuntimeError("Moral core misconfigured.")
-        # Expand with domain checks if you add actions/experiments later.
 
     # --- Ingestion ---
     def ingest(self, subject: str, info: Any, label: Optional[int], source_names: List[str], own: bool = False):
         self.enforce_guardrails("ingest")
-        source_ids = []
-        for nm in source_names:
-            # auto-add source if new
-            existing = [sid for sid, s in self.sources.sources.items() if s.name == nm]
-            sid = existing[0] if existing else self.sources.add(nm)
-            source_ids.append(sid)
-
-        claim = Claim(subject=subject, info=info, label=label, source_ids=source_ids, own=own)
+        # one shared str object per subject across claims, replay and pickles
+        subject = sys.intern(subject)
+        # auto-add sources if new; dict.fromkeys is an order-preserving de-dup of repeated names
+        get_or_add = self.sources.get_or_add
+        source_ids = [get_or_add(nm) for nm in dict.fromkeys(source_names)]
+
+        now = time.time()  # one clock read shared by the claim, replay event and pattern stats
+        claim = Claim(subject=subject, info=info, label=label, source_ids=source_ids, own=own, timestamp=now)
         self.kb.add(claim)
         self.progress[subject].update(source_ids)
 
-        # Update GK if label exists and is numeric-ish
-        if label is not None and isinstance(label, (int, float)):
-            self.gk.update_with_observation(subject, float(label))
+        # Update GK if label exists and is numeric-ish (no-op for None)
+        numeric_label = float(label) if isinstance(label, (int, float)) else None
+        self.gk.update_with_observation(subject, numeric_label)
 
         # reward small increments for procedural compliance (non-harmful, documented)
         self.total_reward += S_rules.reward_scale * 0.01
         self.event_count += 1
     
         # Track replay + simple disagreement pattern
-        self.replay.append(ReplayEvent(
-            kind="ingest",
-            subject=subject,
-            label=float(label) if isinstance(label, (int, float)) else None,
-            timestamp=time.time()
-        ))
-        stats = self.pattern_stats[subject]
-        stats["events"] += 1
-        stats["last_seen"] = time.time()
-        if label is not None and isinstance(label, (int, float)):
-            if stats["last_label"] is not None and stats["last_label"] != label:
-                stats["disagreements"] += 1
-            stats["last_label"] = label
+        self._track_ingest(subject, numeric_label, now)
 
         # Log ingestion event
+        # per-event line: skip all formatting unless INFO is actually emitted
+        if self.logger and self.logger.isEnabledFor(logging.INFO):
+            self.logger.info(
+                "INGEST | subject=%-30s | sources=%-20s | label=%-5s | reward=+%.4f | events=%d",
+                subject, ','.join(source_names), label, S_rules.reward_scale * 0.01, self.event_count
+            )
+
+        self._periodic_maintenance()
+
+    def ingest_batch(self, subjects: List[str], infos: Optional[List[Any]], labels: List[Optional[int]],
+                     source_names_list: List[List[str]], own: bool = False) -> int:
+        """
+        Ingest many claims in one call (infos=None means no info for any claim).
+
+        Each substructure is updated in one pass: distinct source names are
+        resolved once, claims are appended column-wise, and progress, GK priors
+        and pattern stats are updated once per subject. The re-evaluation /
+        checkpoint triggers are checked once at the end. The learned state
+        matches ingesting the same claims one by one.
+        Returns the number of claims ingested.
+        """
+        self.enforce_guardrails("ingest_batch")
+        n = len(subjects)
+        if infos is None:
+            infos = [None] * n
+        if not (len(infos) == len(labels) == len(source_names_list) == n):
+            raise ValueError("ingest_batch: subjects, infos, labels and source_names_list must have equal length")
+        subjects = [sys.intern(subject) for subject in subjects]
+
+        # resolve each distinct name once; first-appearance order assigns the same ids as ingest()
+        get_or_add = self.sources.get_or_add
+        name_ids = {nm: get_or_add(nm) for nm in dict.fromkeys(chain.from_iterable(source_names_list))}
+        id_rows = [[name_ids[nm] for nm in dict.fromkeys(names)] for names in source_names_list]
+        numeric = [float(label) if isinstance(label, (int, float)) else None for label in labels]
+
+        rows_by_subject: Dict[str, List[int]] = defaultdict(list)
+        for i, subject in enumerate(subjects):
+            rows_by_subject[subject].append(i)
+
+        now = time.time()  # one clock read shared by every record in the batch
+        self.kb.add_batch(subjects, infos, labels, id_rows, own, now)
+        for subject, rows in rows_by_subject.items():
+            self.progress[subject].update_batch(
+                list(chain.from_iterable(id_rows[i] for i in rows)), len(rows))
+            subject_labels = [numeric[i] for i in rows]
+            outcomes = [x for x in subject_labels if x is not None]
+            if outcomes:
+                self.gk.update_batch(subject, outcomes)
+            self._dirty_subjects[subject] = None
+            self.pattern_stats.record_batch(subject, subject_labels, now)
+        self.replay.extend(ReplayEvent(kind="ingest", subject=subject, label=label, timestamp=now)
+                           for subject, label in zip(subjects, numeric))
+
+        self.total_reward += S_rules.reward_scale * 0.01 * n
+        self.event_count += n
+
         if self.logger:
-            sources_str = ','.join(source_names)
-            label_str = str(label) if label is not None else "None"
             self.logger.info(
-                f"INGEST | subject={subject:30s} | sources={sources_str:20s} | "
-                f"label={label_str:5s} | reward=+{S_rules.reward_scale * 0.01:.4f} | "
-                f"events={self.event_count}"
+                f"BATCH  | claims={n:4d} | subjects={len(rows_by_subject):2d} | "
+                f"reward=+{S_rules.reward_scale * 0.01 * n:.4f} | events={self.event_count}"
             )
 
-        # periodic re-eval
-        if self.event_count - self.last_reeval_event >= S_rules.reevaluation_interval_events:
-            self.self_reflection()
+        self._periodic_maintenance()
+        return n
+
+    def _track_ingest(self, subject: str, numeric_label: Optional[float], now: float):
+        """Record an ingest in the replay buffer and the disagreement pattern stats."""
+        self._dirty_subjects[subject] = None
+        self.replay.append(ReplayEvent(
+            kind="ingest",
+            subject=subject,
+            label=numeric_label,
+            timestamp=now
+        ))
+        self.pattern_stats.record(subject, numeric_label, now)
+
+    def _periodic_maintenance(self):
+        """Run re-evaluation and checkpointing when their event intervals elapse."""
+        # periodic re-eval; optionally deferred during bursts so it amortizes over wall time
+        since = self.event_count - self.last_reeval_event
+        if since >= S_rules.reevaluation_interval_events:
+            min_sec = S_rules.reevaluation_min_interval_sec
+            if (min_sec <= 0.0
+                    or time.monotonic() - self._last_reeval_ts >= min_sec
+                    or since >= S_rules.reevaluation_interval_events * S_rules.reevaluation_max_defer_factor):
+                self.self_reflection()
 
         # periodic checkpointing
-        if self.enable_checkpoints and (self.event_count - self.last_checkpoint_event >= S_rules.checkpoint_interval_events):
+        since = self.event_count - self.last_checkpoint_event
+        if self.enable_checkpoints and since >= S_rules.checkpoint_interval_events:
             try:
-                ckpt_path = create_checkpoint(self, label=f"event_{self.event_count}")
+                # auto=True: a request inside the debounce window is coalesced and
+                # returns None, so it is retried on the next event; once
+                # interval * max_defer_factor events are unwritten, write (and fsync) regardless
+                overdue = since >= S_rules.checkpoint_interval_events * S_rules.checkpoint_max_defer_factor
+                ckpt_path = create_checkpoint(self, label=f"event_{self.event_count}", auto=not overdue)
+                if ckpt_path is None:
+                    return
                 self.last_checkpoint_event = self.event_count
                 if self.logger:
                     self.logger.info(
@@ -318,25 +1026,25 @@ class ContinuousLearner:
                     self.logger.warning(f"ACTION: checkpoint_failed | error={str(e)}")
 
     # --- Skepticism (simple independence-aware trust) ---
-    def skepticism(self, source_ids: List[str]) -> float:
+    def skepticism(self, source_ids: List[int]) -> float:
         # Lower is better (less skeptical). Combine as: skepticism = product of (1 - trust_i)
-        trusts = [self.sources.inherited_trust(sid) for sid in source_ids]
-        if not trusts:
+        if not source_ids:
             return 1.0
-        independent_conf = 1.0
-        for t in trusts:
-            independent_conf *= (0.9 * t + 0.1)  # soften extremes
+        inherited = self.sources.inherited_trust
+        # soften extremes, then reduce in one C-level product
+        independent_conf = math.prod(0.9 * inherited(sid) + 0.1 for sid in source_ids)
         # skepticism drops as independent_conf rises
         return max(0.0, 1.0 - independent_conf)
 
     # --- Predictions ---
     def can_predict_external(self, subject: str) -> bool:
-        return self.progress[subject].completion_percent >= (S_rules.external_prediction_after * 100.0)
+        return self.progress[subject].ext_ok
     def can_predict_internal(self, subject: str) -> bool:
-        return self.progress[subject].completion_percent >= (S_rules.allow_self_generated_scenarios_after * 100.0)
+        return self.progress[subject].int_ok
 
     def predict(self, subject: str, scenario: Any, evidence_hint: Optional[float], own: bool=False) -> int:
         self.enforce_guardrails("predict")
+        subject = sys.intern(subject)
         if own and not self.can_predict_internal(subject):
             raise RuntimeError("Internal scenarios gated by completion threshold.")
         if not own and not self.can_predict_external(subject):
@@ -344,13 +1052,10 @@ class ContinuousLearner:
 
         prob = self.predictor.predict(subject, scenario, evidence_hint)
         rec = PredictionRecord(subject=subject, scenario=scenario, prob=prob, own=own)
-        self.predictor.log_prediction(rec)
+        idx = self.predictor.log_prediction(rec)
 
         # small shaping reward for calibrated, cautious predictions (avoid overconfidence early)
-        mean_brier = self.predictor.mean_brier()
-        if mean_brier is not None:
-            bonus = max(0.0, 0.25 - mean_brier) * S_rules.reward_scale
-            self.total_reward += bonus
+        self.total_reward += self.predictor.calibration_bonus
 
         self.replay.append(ReplayEvent(
             kind="predict",
@@ -360,7 +1065,7 @@ class ContinuousLearner:
         ))
 
 
-        return len(self.predictor.history) - 1  # index to resolve later
+        return idx  # index to resolve later
 
     def resolve_prediction(self, idx: int, observed: int):
         self.enforce_guardrails("resolve_prediction")
@@ -383,12 +1088,11 @@ class ContinuousLearner:
         ))
 
         # Log prediction resolution
-        if self.logger:
-            result = "✓" if pr.correct else "✗"
+        if self.logger and self.logger.isEnabledFor(logging.INFO):
             self.logger.info(
-                f"RESOLVE | subject={pr.subject:30s} | result={result} | "
-                f"prob={pr.prob:.3f} | observed={observed} | brier={pr.brier:.4f} | "
-                f"reward={S_rules.reward_scale * (1.0 if pr.correct else 0.0) + S_rules.reward_scale * max(0.0, 0.2 - pr.brier):.4f}"
+                "RESOLVE | subject=%-30s | result=%s | prob=%.3f | observed=%s | brier=%.4f | reward=%.4f",
+                pr.subject, "✓" if pr.correct else "✗", pr.prob, observed, pr.brier,
+                S_rules.reward_scale * (1.0 if pr.correct else 0.0) + S_rules.reward_scale * max(0.0, 0.2 - pr.brier)
             )
 
         # update source trust if scenario referenced sources later (you can expand)
@@ -397,25 +1101,34 @@ class ContinuousLearner:
     # --- Self-reflection / Bias / Cross-links ---
     def self_reflection(self):
         # re-evaluate source trust using recent correctness (toy: gentle diffusion)
-        for sid, s in self.sources.sources.items():
-            # nudge toward mid unless proven otherwise (conservative)
-            s.trust = 0.9 * s.trust + 0.1 * 0.5
+        # nudge toward mid unless proven otherwise (conservative)
+        self.sources.diffuse_trust(rate=0.1, target=0.5)
+
+        # only subjects ingested since the last reflection can change their bias status
+        dirty = self._dirty_subjects
+        self._dirty_subjects = {}
+        ts = time.ctime()
 
         # note potential biases (toy: if a subject only has 1 source)
         bias_count_before = len(self.bias_notes)
-        for subj, prog in self.progress.items():
-            if len(prog.distinct_sources) <= 1 and prog.seen_items >= 3:
-                self.bias_notes.append(f"[{time.ctime()}] Subject '{subj}' may be source-biased.")
-
-        # pattern-based warnings (disagreement-heavy subjects)
-        for subj, stats in self.pattern_stats.items():
-            if stats["events"] >= 5:  # don’t warn too early
-                ratio = stats["disagreements"] / max(1, stats["events"])
-                if ratio > S_rules.disagreement_ratio_warn:
-                    note = f"[{time.ctime()}] Subject '{subj}' shows high disagreement ratio={ratio:.2f}."
-                    self.bias_notes.append(note)
-                    # optional: register a link to indicate internal conflict pattern
-                    self.links.append((subj, "high_disagreement", subj))
+        for subj in dirty:
+            prog = self.progress[subj]
+            if prog.seen_items >= 3 and len(prog.distinct_sources) <= 1:
+                self.bias_notes.append(f"[{ts}] Subject '{subj}' may be source-biased.")
+
+        # pattern-based warnings (disagreement-heavy subjects), read from the counter columns
+        stats = self.pattern_stats
+        rows, events, disagreements = stats.row, stats.events, stats.disagreements
+        warn = S_rules.disagreement_ratio_warn
+        for subj in dirty:
+            i = rows.get(subj)
+            if i is None or events[i] < 5:  # don’t warn too early
+                continue
+            ratio = disagreements[i] / events[i]
+            if ratio > warn:
+                self.bias_notes.append(f"[{ts}] Subject '{subj}' shows high disagreement ratio={ratio:.2f}.")
+                # optional: register a link to indicate internal conflict pattern
+                self.links.append((subj, "high_disagreement", subj))
         
         # Log reflection event
         if self.logger:
@@ -431,6 +1144,7 @@ class ContinuousLearner:
             )
 
         self.last_reeval_event = self.event_count
+        self._last_reeval_ts = time.monotonic()
 
         # bounded shadow_eval (only after we have meaningful data)
         if self.event_count > 0 and (self.event_count % S_rules.shadow_eval_after_events) == 0:
@@ -456,7 +1170,9 @@ class ContinuousLearner:
         Very simple placeholder: generate a toy scenario for a subject.
         This should stay explainable and bounded.
         """
-        # Example heuristic: just echo the subject with a timestamp
+        # Example heuristic: just echo the subject with a timestamp.
+        # A fresh dict per call is deliberate: the prediction history keeps a
+        # reference to it, so pooled/reused dicts would rewrite past scenarios.
         return {
             "subject": subject,
             "hypothesis_time": time.time(),
@@ -482,12 +1198,14 @@ class ContinuousLearner:
         reports_dir.mkdir(parents=True, exist_ok=True)
         
         # Calculate metrics
-        total_predictions = len(self.predictor.history)
-        resolved_predictions = [p for p in self.predictor.history if p.resolved]
-        correct_predictions = [p for p in resolved_predictions if p.correct]
+        predictor = self.predictor
+        total_predictions = predictor.history.total
+        resolved_predictions = predictor.resolved_count
+        correct_predictions = predictor.correct_count
         
-        accuracy = len(correct_predictions) / len(resolved_predictions) if resolved_predictions else 0.0
+        accuracy = correct_predictions / resolved_predictions if resolved_predictions else 0.0
         mean_brier = self.predictor.mean_brier()
+        lifetime_brier = predictor.lifetime_mean_brier()
         
         metrics = {
             "timestamp": time.time(),
@@ -495,8 +1213,9 @@ class ContinuousLearner:
             "total_reward": round(self.total_reward, 4),
             "accuracy": round(accuracy, 4) if resolved_predictions else None,
             "calibration_brier": round(mean_brier, 4) if mean_brier else None,
+            "lifetime_brier": round(lifetime_brier, 4) if lifetime_brier is not None else None,
             "total_predictions": total_predictions,
-            "resolved_predictions": len(resolved_predictions),
+            "resolved_predictions": resolved_predictions,
             "bias_count": len(self.bias_notes),
             "subjects_tracked": len(self.progress),
             "sources_count": len(self.sources.sources),
@@ -505,32 +1224,29 @@ class ContinuousLearner:
         # Write report
         timestamp_str = time.strftime("%Y%m%d_%H%M%S", time.gmtime(metrics["timestamp"]))
         report_path = reports_dir / f"metrics_{timestamp_str}.json"
-        with open(report_path, "w") as f:
-            json.dump(metrics, f, indent=2)
+        report_path.write_bytes(json_bytes(metrics))
         
         if self.logger:
             accuracy_str = f"{accuracy:.4f}" if resolved_predictions else "N/A"
             self.logger.info(
                 f"METRICS | report={report_path.name:40s} | accuracy={accuracy_str:>6s} | "
-                f"predictions={total_predictions:3d}/{len(resolved_predictions):3d} | "
+                f"predictions={total_predictions:3d}/{resolved_predictions:3d} | "
                 f"bias_count={len(self.bias_notes):2d}"
             )
 
     # --- Utility / Inspect ---
-    def subject_report(self, subject: str) -> Dict[str, Any]:
+    def subject_report(self, subject: str) -> SubjectReport:
         prog = self.progress[subject]
-        return dict(
-            subject=subject,
-            completion_percent=round(prog.completion_percent, 2),
-            items=prog.seen_items,
-            distinct_sources=len(prog.distinct_sources),
-            gk_prior=round(self.gk.prior(subject), 3),
+        return SubjectReport(
+            subject,
+            prog.completion_percent,
+            prog.seen_items,
+            len(prog.distinct_sources),
+            self.gk.prior(subject),
         )
 
 # ----------------  Demo usage  ----------------
 if __name__ == "__main__":
-    import random
-    
     # Use constrained randomness for reproducibility
     random.seed(42)
     
@@ -595,8 +1311,8 @@ if __name__ == "__main__":
     for subject in subjects:
         if agent.can_predict_external(subject):
             report = agent.subject_report(subject)
-            print(f"  {subject}: {report['completion_percent']:.1f}% complete, "
-                  f"prior={report['gk_prior']:.3f}")
+            print(f"  {subject}: {report.completion_percent:.1f}% complete, "
+                  f"prior={report.gk_prior:.3f}")
             
             # Use constrained randomness for evidence hints
             evidence_hint = random.uniform(0.2, 0.8) if random.random() < 0.6 else None
@@ -655,10 +1371,10 @@ if __name__ == "__main__":
     for subject in subjects:
         report = agent.subject_report(subject)
         print(f"\n{subject}:")
-        print(f"  Completion: {report['completion_percent']:.1f}%")
-        print(f"  Items: {report['items']}")
-        print(f"  Sources: {report['distinct_sources']}")
-        print(f"  GK Prior: {report['gk_prior']:.3f}")
+        print(f"  Completion: {report.completion_percent:.1f}%")
+        print(f"  Items: {report.items}")
+        print(f"  Sources: {report.distinct_sources}")
+        print(f"  GK Prior: {report.gk_prior:.3f}")
     
     print(f"\nOverall Metrics:")
     print(f"  Total events: {agent.event_count}")
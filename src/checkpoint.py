@@ -2,8 +2,9 @@
 Checkpoint and Rollback Utility
 -------------------------------
 Handles snapshot creation, verification, and restoration of the CLAIP system
-state.  Each checkpoint stores serialized objects (KnowledgeBase, GK, etc.)
-plus a SHA256 hash for integrity checking.
+state.  Each checkpoint file stores a metadata header (with a SHA256 hash for
+integrity checking and a table of contents) followed by the serialized objects
+(KnowledgeBase, GK, etc.), each in its own section so restores can load them lazily.
 
 Usage:
     from src import checkpoint
@@ -12,31 +13,371 @@ Usage:
     restored_agent = checkpoint.restore_checkpoint("checkpoints/core_state_<timestamp>.pkl")
 """
 
+import io
 import os
+import mmap
+import struct
+import copyreg
+import time
+import atexit
 import pickle
 import json
 import hashlib
+import weakref
 from datetime import datetime
-from pathlib import Path
+from array import array
+from pathlib import Path, PurePath
+from typing import List, Optional, Tuple
+
+try:
+    from src.jsonio import json_bytes
+except ImportError:
+    from jsonio import json_bytes
+
+# Optional zstd compression for checkpoint files (plain pickle otherwise)
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
 CHECKPOINT_DIR = Path("checkpoints")
 
+# Automatic checkpoints for the same agent are rate-limited to one per window;
+# requests inside the window are coalesced and the latest state is written by
+# the next request after the window (or by flush_pending / interpreter exit).
+DEBOUNCE_SEC = 0.1
+_last_auto_write = weakref.WeakKeyDictionary()  # agent -> monotonic time of last automatic write
+_pending = weakref.WeakKeyDictionary()          # agent -> label of the latest coalesced request
+
+# Content-addressed dedup: if a new checkpoint's payload is identical to the last
+# one written, a small .ref file naming that .pkl is written instead.
+_last_payload: Optional[Tuple[bytes, Path, str]] = None  # (payload digest, .pkl path, its sha256)
+
 def _timestamp():
     return datetime.utcnow().strftime("%Y%m%d_%H%M%S")
 
-def _hash_file(path: Path) -> str:
-    """Return SHA256 hash of file content."""
+# Framed checkpoint payload (inside the optional zstd layer):
+#   _FRAME_MAGIC | u64 pickle length | pickle | (u64 buffer length | buffer bytes)*
+# array.array columns are pickled as protocol-5 out-of-band buffers, so their
+# bytes go straight from the arrays into the file instead of being copied
+# into intermediate bytes objects inside the pickle stream.
+_FRAME_MAGIC = b"CLAIPOOB"
+_U64 = struct.Struct("<Q")
+
+def _array_from_buffer(typecode: str, buf) -> array:
+    a = array(typecode)
+    a.frombytes(buf)
+    return a
+
+def _reduce_array(a: array):
+    return _array_from_buffer, (a.typecode, pickle.PickleBuffer(a))
+
+def _frame_parts(obj, persistent_id=None) -> list:
+    """
+    Pickle obj with array columns out-of-band and return the framed payload
+    as a list of byte chunks (the array chunks are views, not copies).
+    """
+    buffers = []
+    data = io.BytesIO()
+    pickler = pickle.Pickler(data, protocol=5, buffer_callback=buffers.append)
+    pickler.dispatch_table = copyreg.dispatch_table.copy()
+    pickler.dispatch_table[array] = _reduce_array
+    if persistent_id is not None:
+        pickler.persistent_id = persistent_id
+    pickler.dump(obj)
+    parts = [_FRAME_MAGIC, _U64.pack(data.tell()), data.getbuffer()]
+    for buf in buffers:
+        raw = buf.raw()
+        parts += (_U64.pack(raw.nbytes), raw)
+    return parts
+
+def _load_payload(payload, persistent_load=None):
+    """Unpickle a (decompressed) checkpoint payload; buffers are zero-copy slices of it."""
+    if payload[:len(_FRAME_MAGIC)] != _FRAME_MAGIC:
+        raise pickle.UnpicklingError("Checkpoint section is not a framed payload.")
+    view = memoryview(payload)
+    parts = []
+    try:
+        pos = len(_FRAME_MAGIC)
+        while pos < len(view):
+            (n,) = _U64.unpack_from(view, pos)
+            pos += _U64.size
+            parts.append(view[pos:pos + n])
+            pos += n
+        if persistent_load is None:
+            return pickle.loads(parts[0], buffers=parts[1:])
+        unpickler = pickle.Unpickler(io.BytesIO(parts[0]), buffers=parts[1:])
+        unpickler.persistent_load = persistent_load
+        return unpickler.load()
+    finally:
+        # drop exports on payload promptly (an mmap cannot close while they exist)
+        for part in parts:
+            part.release()
+        view.release()
+
+# Sectioned payload: each non-scalar attribute of the agent is framed (and
+# compressed) as its own section, and the scalar remainder goes in _SHELL as
+# (class, state). The metadata's "sections" table of contents lists
+# [name, offset, length] with offsets relative to the payload start, so a
+# restore can unpickle one section without touching the others. Sections
+# refer to each other's top-level objects by name (pickle persistent ids),
+# which keeps shared references such as predictor.gk is agent.gk intact.
+# Agents whose state is not a dict are stored whole in a single _WHOLE section.
+_SHELL = "__agent__"
+_WHOLE = "__object__"
+_SCALARS = (bool, int, float, complex, str, bytes, type(None), PurePath)
+
+def _section_parts(agent) -> List[Tuple[str, list]]:
+    """
+    Split agent into named sections, each a list of framed payload chunks.
+    Falls back to one _WHOLE section if sections would reference each other
+    cyclically (such sections could not be loaded one at a time).
+    """
+    state = agent.__getstate__()
+    if not isinstance(state, dict):
+        return [(_WHOLE, _frame_parts(agent))]
+    shell = {k: v for k, v in state.items() if isinstance(v, _SCALARS)}
+    sections = {k: v for k, v in state.items() if k not in shell}
+    owners = {id(v): k for k, v in sections.items()}
+    owners[id(agent)] = _SHELL
+    deps = {name: set() for name in sections}
+
+    def parts_of(name, obj):
+        def persistent_id(o):
+            owner = owners.get(id(o))
+            if owner is None or owner == name:
+                return None
+            if owner != _SHELL:  # the shell is rebuilt before any section loads
+                deps[name].add(owner)
+            return owner
+        return _frame_parts(obj, persistent_id)
+
+    result = [(_SHELL, parts_of(_SHELL, (type(agent), shell)))]
+    result += [(name, parts_of(name, obj)) for name, obj in sections.items()]
+    if _has_cycle(deps):
+        return [(_WHOLE, _frame_parts(agent))]
+    return result
+
+def _has_cycle(deps: dict) -> bool:
+    """True if the section dependency graph (name -> referenced names) has a cycle."""
+    done, active = set(), set()
+
+    def visit(name) -> bool:
+        if name in active:
+            return True
+        if name in done:
+            return False
+        active.add(name)
+        found = any(visit(dep) for dep in deps[name])
+        active.discard(name)
+        done.add(name)
+        return found
+
+    return any(visit(name) for name in deps)
+
+class LazySections:
+    """
+    Open sectioned checkpoint backing a lazily restored agent. The file stays
+    mapped until every section has been loaded or assigned on the agent (or
+    close() is called); each loaded section is set on the agent as a plain
+    attribute unless the caller already assigned one under that name.
+    """
+
+    def __init__(self, path: Path, meta: dict):
+        self._toc = {name: (offset, length) for name, offset, length in meta["sections"]}
+        self._compressed = meta.get("compression") == "zstd"
+        if self._compressed and zstandard is None:
+            raise ImportError("Checkpoint is zstd-compressed; install 'zstandard' to restore it.")
+        self._loaded = {}
+        self._loading = set()
+        self.agent = None
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (n,) = _U32.unpack_from(self._mm, len(_FILE_MAGIC))
+        self._base = len(_FILE_MAGIC) + _U32.size + n
+
+    def __contains__(self, name: str) -> bool:
+        """True if name is a section that has not been loaded (or assigned) yet."""
+        return name in self._toc and name not in self._loaded and name not in self.agent.__dict__
+
+    def pending(self) -> List[str]:
+        return [name for name in self._toc if name in self]
+
+    def open_agent(self, lazy: bool = False):
+        """Rebuild the agent from its shell section; load everything now unless lazy."""
+        if _WHOLE in self._toc:
+            self.agent = self._unpickle(_WHOLE)
+            self.close()
+            return self.agent
+        cls, state = self._unpickle(_SHELL)
+        agent = cls.__new__(cls)
+        if hasattr(agent, "__setstate__"):
+            agent.__setstate__(state)
+        else:
+            agent.__dict__.update(state)
+        self.agent = agent
+        self._loaded[_SHELL] = agent
+        agent.__dict__["_lazy_sections"] = self
+        if not lazy:
+            self.load_all()
+        return agent
+
+    def load(self, name: str):
+        """
+        Unpickle section name (once) and return it; it is attached to the agent
+        unless an attribute of that name was assigned meanwhile.
+        """
+        if name not in self._loaded:
+            if name in self._loading:
+                raise pickle.UnpicklingError(f"Checkpoint sections reference each other cyclically: {name}")
+            self._loading.add(name)
+            try:
+                value = self._unpickle(name)
+            finally:
+                self._loading.discard(name)
+            self._loaded[name] = value
+            self.agent.__dict__.setdefault(name, value)
+        if not self.pending():
+            self._detach()
+        return self._loaded[name]
+
+    def load_all(self):
+        """Load every pending section, then unmap the file."""
+        for name in self.pending():
+            self.load(name)
+        self._detach()
+
+    def _detach(self):
+        self.agent.__dict__.pop("_lazy_sections", None)
+        self.close()
+
+    def _unpickle(self, name: str):
+        offset, length = self._toc[name]
+        start = self._base + offset
+        with memoryview(self._mm) as view:
+            blob = view[start:start + length]
+            try:
+                if self._compressed:
+                    with zstandard.ZstdDecompressor().stream_reader(blob, closefd=False) as zr:
+                        return _load_payload(zr.readall(), self.load)
+                return _load_payload(blob, self.load)
+            finally:
+                blob.release()
+
+    def close(self):
+        if not self._mm.closed:
+            self._mm.close()
+
+# Single-file checkpoint layout (metadata travels with the payload):
+#   _FILE_MAGIC | u32 metadata length | metadata JSON | payload (zstd or framed pickle)
+# The metadata's sha256 covers the payload bytes as stored on disk.
+_FILE_MAGIC = b"CLAIPCK2"
+_U32 = struct.Struct("<I")
+_IOV_MAX = 1024
+
+def _write_all(fd: int, chunks):
+    """Write byte chunks to fd with as few writev calls as possible (short writes resumed)."""
+    views = [memoryview(c).cast("B") for c in chunks if len(c)]
+    if not hasattr(os, "writev"):  # e.g. Windows
+        for v in views:
+            while v:
+                v = v[os.write(fd, v):]
+        return
+    i = 0
+    while i < len(views):
+        n = os.writev(fd, views[i:i + _IOV_MAX])
+        while n:
+            if n >= len(views[i]):
+                n -= len(views[i])
+                i += 1
+            else:
+                views[i] = views[i][n:]
+                n = 0
+
+def _write_checkpoint_file(path: Path, metadata: dict, payload_chunks, sync: bool = True) -> str:
+    """
+    Write header + payload with one writev into path + ".tmp", then atomically
+    rename it over path, so a crash never leaves a truncated checkpoint under
+    the final name. Only when sync=True are the file and (on POSIX) its
+    directory fsynced, so the rename itself survives a crash. Returns the
+    payload sha256.
+    """
     h = hashlib.sha256()
-    with open(path, "rb") as f:
-        for chunk in iter(lambda: f.read(8192), b""):
-            h.update(chunk)
-    return h.hexdigest()
+    for chunk in payload_chunks:
+        h.update(chunk)
+    metadata["sha256"] = h.hexdigest()
+    meta_bytes = json_bytes(metadata)
+    tmp_path = path.with_name(path.name + ".tmp")
+    # O_BINARY (Windows only) keeps os.write from translating newlines
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), 0o644)
+    try:
+        try:
+            _write_all(fd, [_FILE_MAGIC, _U32.pack(len(meta_bytes)), meta_bytes, *payload_chunks])
+            if sync:
+                os.fsync(fd)
+        finally:
+            os.close(fd)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    if sync:
+        _fsync_dir(path.parent)
+    return metadata["sha256"]
 
-def create_checkpoint(agent, label: str = "") -> Path:
+def _fsync_dir(directory: Path):
+    """Persist directory entries (e.g. a rename) on POSIX; Windows cannot open directories."""
+    if os.name != "posix":
+        return
+    fd = os.open(directory, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def _read_header(f) -> Optional[dict]:
+    """Read the embedded metadata, leaving f at the payload; None if f lacks the checkpoint header."""
+    head = f.read(len(_FILE_MAGIC) + _U32.size)
+    if head[:len(_FILE_MAGIC)] != _FILE_MAGIC:
+        return None
+    (n,) = _U32.unpack_from(head, len(_FILE_MAGIC))
+    return json.loads(f.read(n))
+
+def read_checkpoint_meta(ckpt_path: Path) -> Optional[dict]:
+    """Return a checkpoint's embedded metadata (None if the file has no checkpoint header)."""
+    with open(ckpt_path, "rb") as f:
+        return _read_header(f)
+
+def create_checkpoint(agent, label: str = "", auto: bool = False, verbose: bool = False) -> Optional[Path]:
     """
-    Serialize the current agent state to a checkpoint file and write
-    a companion metadata file with hash and timestamp.
+    Serialize the current agent state to a single checkpoint file: a small
+    metadata header (timestamp, label, payload hash) followed by the payload,
+    written with one writev to a temp file that is atomically renamed into place.
+
+    The payload is split into independently loadable sections listed in the
+    metadata (see _section_parts), each pickled with protocol 5 and array
+    columns stored as out-of-band buffers (see _frame_parts). If the payload is byte-identical to
+    the previous checkpoint's, a .ref pointer to that .pkl is written (and
+    returned) instead; restore_checkpoint follows it.
+
+    auto=True marks a periodic request: if this agent was auto-checkpointed
+    less than DEBOUNCE_SEC ago, nothing is written and None is returned
+    (flush_pending writes it later). Any other call also satisfies a
+    coalesced request for the agent.
+    Automatic writes also skip fsync (the rename still keeps them whole; a
+    crash may lose the newest one). Explicit calls (the default) always
+    write synchronously and fsync.
+
+    Status lines are printed only when verbose=True.
     """
+    if auto:
+        now = time.monotonic()
+        if now - _last_auto_write.get(agent, -DEBOUNCE_SEC) < DEBOUNCE_SEC:
+            _pending[agent] = label
+            return None
+        _last_auto_write[agent] = now
+    _pending.pop(agent, None)  # this write covers any coalesced request
+
     CHECKPOINT_DIR.mkdir(parents=True, exist_ok=True)
 
     ts = _timestamp()
@@ -45,61 +386,122 @@ def create_checkpoint(agent, label: str = "") -> Path:
         base += f"_{label}"
 
     ckpt_path = CHECKPOINT_DIR / f"{base}.pkl"
-    meta_path = CHECKPOINT_DIR / f"{base}.json"
 
     # --- Serialize agent state ---
-    with open(ckpt_path, "wb") as f:
-        pickle.dump(agent, f)
+    global _last_payload
+    sections = _section_parts(agent)
+    digest = hashlib.blake2b(digest_size=16)
+    for name, parts in sections:
+        digest.update(name.encode())
+        for part in parts:
+            digest.update(part)
+    digest = digest.digest()
+    # refs name their target relative to their own directory, so only dedup
+    # against a .pkl in the directory this checkpoint is going to
+    if (_last_payload is not None and _last_payload[0] == digest
+            and _last_payload[1].parent == ckpt_path.parent and _last_payload[1].exists()):
+        target, target_sha = _last_payload[1], _last_payload[2]
+        if target == ckpt_path:  # same second, same label, same state: already on disk
+            if verbose:
+                print(f"✅ Checkpoint unchanged: {ckpt_path.name}")
+            return ckpt_path
+        ref_path = ckpt_path.with_suffix(".ref")
+        metadata = {"timestamp": ts, "label": label, "path": str(ref_path),
+                    "ref": target.name, "ref_sha256": target_sha}
+        _write_checkpoint_file(ref_path, metadata, [], sync=not auto)
+        if verbose:
+            print(f"✅ Checkpoint unchanged: {ref_path.name} -> {target.name}")
+        return ref_path
 
-    file_hash = _hash_file(ckpt_path)
+    payload, toc, offset = [], [], 0
+    for name, parts in sections:
+        if zstandard is not None:
+            # one frame per section so each can be decompressed on its own;
+            # level 1: repeated subject/source strings compress well at near-memcpy speed
+            cobj = zstandard.ZstdCompressor(level=1).compressobj()
+            parts = [cobj.compress(part) for part in parts]
+            parts.append(cobj.flush())
+        length = sum(len(memoryview(part).cast("B")) for part in parts)
+        toc.append([name, offset, length])
+        payload += parts
+        offset += length
 
     metadata = {
         "timestamp": ts,
         "label": label,
         "path": str(ckpt_path),
-        "sha256": file_hash,
+        "compression": "zstd" if zstandard is not None else None,
+        "sections": toc,
     }
+    sha = _write_checkpoint_file(ckpt_path, metadata, payload, sync=not auto)
+    _last_payload = (digest, ckpt_path, sha)
 
-    with open(meta_path, "w", encoding="utf-8") as f:
-        json.dump(metadata, f, indent=2)
-
-    print(f"✅ Checkpoint created: {ckpt_path.name}")
+    if verbose:
+        print(f"✅ Checkpoint created: {ckpt_path.name}")
     return ckpt_path
 
-def verify_checkpoint(ckpt_path: Path) -> bool:
-    """Validate file integrity using its .json metadata hash."""
-    meta_path = ckpt_path.with_suffix(".json")
-    if not meta_path.exists():
-        print("⚠️  Metadata file not found.")
-        return False
+def flush_pending():
+    """Write the latest state of every agent with a coalesced automatic checkpoint."""
+    for agent, label in list(_pending.items()):
+        del _pending[agent]
+        try:
+            create_checkpoint(agent, label=label)
+        except Exception as e:
+            print(f"⚠️  Deferred checkpoint failed: {e}")
+
+atexit.register(flush_pending)
 
-    with open(meta_path, "r", encoding="utf-8") as f:
-        meta = json.load(f)
+def verify_checkpoint(ckpt_path: Path, verbose: bool = False) -> bool:
+    """Validate file integrity against the hash in its metadata."""
+    with open(ckpt_path, "rb") as f:
+        meta = _read_header(f)
+        if meta is None:
+            if verbose:
+                print("⚠️  Checkpoint header not found.")
+            return False
+        current_hash = hashlib.file_digest(f, "sha256").hexdigest()
 
-    current_hash = _hash_file(ckpt_path)
     if current_hash == meta.get("sha256"):
-        print("✅ Checksum verified.")
+        if verbose:
+            print("✅ Checksum verified.")
         return True
     else:
-        print("❌ Hash mismatch — file may be corrupted.")
+        if verbose:
+            print("❌ Hash mismatch — file may be corrupted.")
         return False
 
-def restore_checkpoint(ckpt_filename: str):
+def restore_checkpoint(ckpt_filename: str, verbose: bool = False, lazy: bool = False):
     """
     Load an agent from a checkpoint file if hash verification passes.
     Returns the deserialized agent object.
+
+    With lazy=True only the agent's scalar fields are unpickled up front;
+    each other attribute (kb, predictor, replay, ...) is unpickled from the
+    mapped file on first access (see LazySections), and the file stays
+    mapped until all of them are loaded or reassigned.
     """
     ckpt_path = Path(ckpt_filename)
     if not ckpt_path.exists():
         raise FileNotFoundError(f"Checkpoint not found: {ckpt_filename}")
 
-    if not verify_checkpoint(ckpt_path):
+    meta = read_checkpoint_meta(ckpt_path)
+    if meta is None or not (meta.get("ref") or meta.get("sections")):
+        # e.g. the pickle + .json sidecar files written by early releases
+        raise ValueError(f"Unsupported checkpoint format: {ckpt_filename}")
+
+    if not verify_checkpoint(ckpt_path, verbose=verbose):
         raise ValueError("Integrity check failed. Aborting restore.")
 
-    with open(ckpt_path, "rb") as f:
-        agent = pickle.load(f)
+    if meta.get("ref"):  # dedup pointer to an identical earlier checkpoint
+        target = ckpt_path.with_name(meta["ref"])
+        target_meta = read_checkpoint_meta(target) if target.exists() else None
+        if target_meta is None or target_meta.get("sha256") != meta.get("ref_sha256"):
+            raise ValueError(f"Checkpoint {ckpt_path.name} refers to {meta['ref']}, which has been replaced or removed.")
+        return restore_checkpoint(target, verbose=verbose, lazy=lazy)
 
-    print(f"🔁 Restored checkpoint: {ckpt_path.name}")
+    agent = LazySections(ckpt_path, meta).open_agent(lazy=lazy)
+    if verbose:
+        print(f"🔁 Restored checkpoint: {ckpt_path.name}")
     return agent
 
 def list_checkpoints(limit: int = 10):
@@ -107,7 +509,11 @@ def list_checkpoints(limit: int = 10):
     if not CHECKPOINT_DIR.exists():
         print("No checkpoints directory found.")
         return []
-    files = sorted(CHECKPOINT_DIR.glob("core_state_*.pkl"), key=os.path.getmtime, reverse=True)
-    for f in files[:limit]:
-        print(f"- {f.name}")
-    return files
+    # one directory scan, one stat per matching entry (decorate-sort-undecorate)
+    with os.scandir(CHECKPOINT_DIR) as it:
+        entries = [(e.stat().st_mtime, e.name) for e in it
+                   if e.name.startswith("core_state_") and e.name.endswith((".pkl", ".ref"))]
+    entries.sort(reverse=True)
+    for _, name in entries[:limit]:
+        print(f"- {name}")
+    return [CHECKPOINT_DIR / name for _, name in entries]
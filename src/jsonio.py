@@ -0,0 +1,16 @@
+"""JSON Encoding Helper
+
+Single home for the JSON encoder used by checkpoint metadata and metrics
+reports: orjson when it is installed, stdlib json otherwise. Both produce
+indented UTF-8 bytes.
+"""
+
+import json
+
+try:
+    import orjson
+    def json_bytes(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+except ImportError:
+    def json_bytes(obj) -> bytes:
+        return json.dumps(obj, indent=2).encode("utf-8")
@@ -1,29 +1,38 @@
 """Tests for checkpoint and rollback functionality"""
 
 import unittest
+import pickle
 import tempfile
 import shutil
+from unittest import mock
 from pathlib import Path
-from src.CLAIP import ContinuousLearner
-from src.checkpoint import create_checkpoint, restore_checkpoint, verify_checkpoint, list_checkpoints
+import src.checkpoint as cp_module
+from src.CLAIP import ContinuousLearner, S_rules
+from src.checkpoint import (create_checkpoint, restore_checkpoint, verify_checkpoint, list_checkpoints,
+                            read_checkpoint_meta)
 
 
 class TestCheckpoints(unittest.TestCase):
     """Test checkpoint creation, verification, and restoration"""
     
-    def setUp(self):
-        """Set up test environment with temporary checkpoint directory"""
-        self.temp_dir = Path(tempfile.mkdtemp())
+    @classmethod
+    def setUpClass(cls):
+        """Create one temporary checkpoint directory shared by all tests in the class"""
+        cls.temp_dir = Path(tempfile.mkdtemp())
         # Temporarily override checkpoint directory
-        import src.checkpoint as cp_module
-        self.original_dir = cp_module.CHECKPOINT_DIR
-        cp_module.CHECKPOINT_DIR = self.temp_dir
+        cls.original_dir = cp_module.CHECKPOINT_DIR
+        cp_module.CHECKPOINT_DIR = cls.temp_dir
+    
+    @classmethod
+    def tearDownClass(cls):
+        """Restore the checkpoint directory and remove the temporary one"""
+        cp_module.CHECKPOINT_DIR = cls.original_dir
+        shutil.rmtree(cls.temp_dir, ignore_errors=True)
         
     def tearDown(self):
-        """Clean up temporary directory"""
-        import src.checkpoint as cp_module
-        cp_module.CHECKPOINT_DIR = self.original_dir
-        shutil.rmtree(self.temp_dir, ignore_errors=True)
+        """Empty the shared directory so each test starts from no checkpoints"""
+        for p in self.temp_dir.iterdir():
+            p.unlink()
     
     def test_checkpoint_creation(self):
         """Test that checkpoints are created successfully"""
@@ -31,43 +40,26 @@ class TestCheckpoints(unittest.TestCase):
         agent.ingest("test.subject", info={"val": 1}, label=1, source_names=["Source1"])
         agent.ingest("test.subject", info={"val": 2}, label=0, source_names=["Source2"])
         
-        # Create checkpoint (suppress print output)
-        import sys
-        from io import StringIO
-        old_stdout = sys.stdout
-        sys.stdout = StringIO()
-        try:
-            ckpt_path = create_checkpoint(agent, label="test_checkpoint")
-        finally:
-            sys.stdout = old_stdout
+        # Create checkpoint (quiet by default)
+        ckpt_path = create_checkpoint(agent, label="test_checkpoint")
         
         # Verify checkpoint file exists
         self.assertTrue(ckpt_path.exists())
         
-        # Verify metadata file exists
-        meta_path = ckpt_path.with_suffix(".json")
-        self.assertTrue(meta_path.exists())
+        # Verify metadata is embedded in the checkpoint file
+        meta = read_checkpoint_meta(ckpt_path)
+        self.assertEqual(meta["label"], "test_checkpoint")
+        self.assertIn("sha256", meta)
     
     def test_checkpoint_verification(self):
         """Test checkpoint integrity verification"""
         agent = ContinuousLearner(enable_logging=False, enable_checkpoints=True)
         agent.ingest("test.subject", info={"val": 1}, label=1, source_names=["Source1"])
         
-        import sys
-        from io import StringIO
-        old_stdout = sys.stdout
-        sys.stdout = StringIO()
-        try:
-            ckpt_path = create_checkpoint(agent, label="verify_test")
-        finally:
-            sys.stdout = old_stdout
+        ckpt_path = create_checkpoint(agent, label="verify_test")
         
-        # Verify checkpoint (suppress print output)
-        sys.stdout = StringIO()
-        try:
-            result = verify_checkpoint(ckpt_path)
-        finally:
-            sys.stdout = old_stdout
+        # Verify checkpoint
+        result = verify_checkpoint(ckpt_path)
         self.assertTrue(result)
     
     def test_checkpoint_restore(self):
@@ -79,22 +71,11 @@ class TestCheckpoints(unittest.TestCase):
         original_event_count = agent1.event_count
         original_reward = agent1.total_reward
         
-        # Create checkpoint (suppress print output)
-        import sys
-        from io import StringIO
-        old_stdout = sys.stdout
-        sys.stdout = StringIO()
-        try:
-            ckpt_path = create_checkpoint(agent1, label="restore_test")
-        finally:
-            sys.stdout = old_stdout
+        # Create checkpoint
+        ckpt_path = create_checkpoint(agent1, label="restore_test")
         
-        # Create new agent and restore (suppress print output)
-        sys.stdout = StringIO()
-        try:
-            agent2 = restore_checkpoint(str(ckpt_path))
-        finally:
-            sys.stdout = old_stdout
+        # Create new agent and restore
+        agent2 = restore_checkpoint(str(ckpt_path))
         
         # Verify state is restored
         self.assertEqual(agent2.event_count, original_event_count)
@@ -116,16 +97,9 @@ class TestCheckpoints(unittest.TestCase):
         original_gk_prior = agent1.gk.prior("subject1")
         original_replay_size = len(agent1.replay)
         
-        # Checkpoint and restore (suppress print output)
-        import sys
-        from io import StringIO
-        old_stdout = sys.stdout
-        sys.stdout = StringIO()
-        try:
-            ckpt_path = create_checkpoint(agent1, label="state_test")
-            agent2 = restore_checkpoint(str(ckpt_path))
-        finally:
-            sys.stdout = old_stdout
+        # Checkpoint and restore
+        ckpt_path = create_checkpoint(agent1, label="state_test")
+        agent2 = restore_checkpoint(str(ckpt_path))
         
         # Verify all state preserved
         self.assertEqual(agent2.event_count, agent1.event_count)
@@ -134,6 +108,64 @@ class TestCheckpoints(unittest.TestCase):
         self.assertAlmostEqual(agent2.gk.prior("subject1"), original_gk_prior, places=3)
         self.assertEqual(len(agent2.replay), original_replay_size)
     
+    def test_checkpoint_lazy_restore(self):
+        """Test that restored components are loaded on first access"""
+        agent1 = ContinuousLearner(enable_logging=False, enable_checkpoints=True)
+        agent1.ingest("subject1", info={}, label=1, source_names=["S1"])
+        agent1.predict("subject1", scenario={}, evidence_hint=0.7, own=False)
+
+        ckpt_path = create_checkpoint(agent1, label="lazy_test")
+        agent2 = restore_checkpoint(str(ckpt_path), lazy=True)
+
+        self.assertEqual(agent2.event_count, agent1.event_count)
+        self.assertNotIn("kb", vars(agent2))
+        self.assertEqual(len(agent2.kb.claims), 1)
+        self.assertIn("kb", vars(agent2))
+        # Shared components stay shared across sections
+        self.assertIs(agent2.predictor.gk, agent2.gk)
+
+        # Re-checkpointing a partially loaded agent writes every component
+        agent3 = restore_checkpoint(str(create_checkpoint(agent2, label="lazy_again")), lazy=False)
+        self.assertEqual(len(agent3.replay), len(agent1.replay))
+        self.assertEqual(len(agent3.sources.sources), 1)
+
+    def test_checkpoint_lazy_assign_then_recheckpoint(self):
+        """Test that attributes assigned before their section loads are kept"""
+        agent1 = ContinuousLearner(enable_logging=False, enable_checkpoints=True)
+        agent1.ingest("subject1", info={}, label=1, source_names=["S1"])
+        agent1.bias_notes.append("old")
+
+        agent2 = restore_checkpoint(str(create_checkpoint(agent1, label="assign_a")), lazy=True)
+        agent2.bias_notes = ["new"]
+        agent3 = restore_checkpoint(str(create_checkpoint(agent2, label="assign_b")))
+
+        self.assertEqual(agent2.bias_notes, ["new"])
+        self.assertEqual(agent3.bias_notes, ["new"])
+        self.assertNotIn("_lazy_sections", vars(agent2))  # every section loaded, file unmapped
+
+    def test_checkpoint_cyclic_sections(self):
+        """Test that components referencing each other are stored and restored together"""
+        agent1 = ContinuousLearner(enable_logging=False, enable_checkpoints=True)
+        agent1.bias_notes.append(agent1.links)
+        agent1.links.append(agent1.bias_notes)
+
+        ckpt_path = create_checkpoint(agent1, label="cyclic")
+        self.assertEqual([s[0] for s in read_checkpoint_meta(ckpt_path)["sections"]], ["__object__"])
+
+        agent2 = restore_checkpoint(str(ckpt_path), lazy=True)
+        self.assertIs(agent2.bias_notes[0], agent2.links)
+        self.assertIs(agent2.links[0], agent2.bias_notes)
+
+    def test_checkpoint_unsupported_format(self):
+        """Test that a plain pickle with a .json sidecar (early releases) is rejected clearly"""
+        ckpt_path = self.temp_dir / "core_state_old.pkl"
+        ckpt_path.write_bytes(pickle.dumps({"event_count": 1}))
+        ckpt_path.with_suffix(".json").write_text('{"sha256": ""}')
+
+        self.assertFalse(verify_checkpoint(ckpt_path))
+        with self.assertRaisesRegex(ValueError, "Unsupported checkpoint format"):
+            restore_checkpoint(str(ckpt_path))
+
     def test_checkpoint_automatic_creation(self):
         """Test automatic checkpoint creation during learning"""
         agent = ContinuousLearner(enable_logging=False, enable_checkpoints=True)
@@ -147,6 +179,78 @@ class TestCheckpoints(unittest.TestCase):
         self.assertGreater(len(checkpoints), 0, "At least one checkpoint should be created")
 
 
+    def test_checkpoint_coalescing_and_flush(self):
+        """Test that rapid automatic checkpoints coalesce and are written by flush_pending"""
+        agent = ContinuousLearner(enable_logging=False, enable_checkpoints=True)
+        agent.ingest("subject1", info={}, label=1, source_names=["S1"])
+
+        self.assertIsNotNone(create_checkpoint(agent, label="auto_a", auto=True))
+        self.assertIsNone(create_checkpoint(agent, label="auto_b", auto=True))  # inside debounce window
+        self.assertIn(agent, cp_module._pending)
+
+        agent.ingest("subject1", info={}, label=0, source_names=["S1"])
+        cp_module.flush_pending()
+        self.assertNotIn(agent, cp_module._pending)
+        self.assertEqual(len(list(self.temp_dir.glob("core_state_*_auto_b.pkl"))), 1)
+
+        # An explicit checkpoint satisfies a coalesced request
+        self.assertIsNone(create_checkpoint(agent, label="auto_c", auto=True))
+        create_checkpoint(agent, label="explicit")
+        self.assertNotIn(agent, cp_module._pending)
+
+    def test_checkpoint_deferral_capped(self):
+        """Test that a fast burst still checkpoints at least every interval * max_defer_factor events"""
+        agent = ContinuousLearner(enable_logging=False, enable_checkpoints=True)
+        cap = S_rules.checkpoint_interval_events * S_rules.checkpoint_max_defer_factor
+
+        agent.ingest_batch(["burst"] * 3 * cap, None, [1] * (3 * cap), [["S1"]] * (3 * cap))
+        for i in range(3 * cap):
+            agent.ingest("burst", info={}, label=i % 2, source_names=["S1"])
+
+        self.assertLess(agent.event_count - agent.last_checkpoint_event, cap)
+
+    def test_checkpoint_dedup_ref(self):
+        """Test that an unchanged agent is checkpointed as a .ref pointer that restores"""
+        agent1 = ContinuousLearner(enable_logging=False, enable_checkpoints=True)
+        agent1.ingest("subject1", info={}, label=1, source_names=["S1"])
+
+        with mock.patch.object(cp_module, "_timestamp", return_value="20250101_000000"):
+            first = create_checkpoint(agent1, label="dedup_a")
+            # Same name and same state: the existing file is returned as is
+            self.assertEqual(create_checkpoint(agent1, label="dedup_a"), first)
+            ref_path = create_checkpoint(agent1, label="dedup_b")
+
+        self.assertEqual(first.suffix, ".pkl")
+        self.assertEqual(ref_path.suffix, ".ref")
+        self.assertEqual(read_checkpoint_meta(ref_path)["ref"], first.name)
+        self.assertTrue(verify_checkpoint(ref_path))
+
+        agent2 = restore_checkpoint(str(ref_path))
+        self.assertEqual(agent2.event_count, agent1.event_count)
+        self.assertEqual(len(agent2.kb.claims), 1)
+
+        # A ref to a target rewritten with different state is refused, not silently followed
+        agent1.ingest("subject1", info={}, label=0, source_names=["S1"])
+        with mock.patch.object(cp_module, "_timestamp", return_value="20250101_000000"):
+            self.assertEqual(create_checkpoint(agent1, label="dedup_a"), first)
+        with self.assertRaisesRegex(ValueError, "replaced or removed"):
+            restore_checkpoint(str(ref_path))
+
+    def test_checkpoint_dedup_other_directory(self):
+        """Test that an unchanged agent checkpointed into a new directory gets a full .pkl"""
+        agent = ContinuousLearner(enable_logging=False, enable_checkpoints=True)
+        agent.ingest("subject1", info={}, label=1, source_names=["S1"])
+        create_checkpoint(agent, label="dir_a")
+
+        other_dir = self.temp_dir / "other"
+        try:
+            with mock.patch.object(cp_module, "CHECKPOINT_DIR", other_dir):
+                ckpt_path = create_checkpoint(agent, label="dir_b")
+            self.assertEqual(ckpt_path.suffix, ".pkl")
+            self.assertEqual(restore_checkpoint(str(ckpt_path)).event_count, agent.event_count)
+        finally:
+            shutil.rmtree(other_dir, ignore_errors=True)
+
 if __name__ == "__main__":
     unittest.main()
 
@@ -2,16 +2,20 @@
 
 import unittest
 import random
-from src.CLAIP import ContinuousLearner, S_rules
+import dataclasses
+from unittest import mock
+import src.CLAIP as CLAIP
+from src.CLAIP import (ContinuousLearner, GeneralizedKnowledge, PredictionTable, ReplayEvent, ReplayMap,
+                       S_rules, SourceCardinality)
 
 
 class TestEndToEnd(unittest.TestCase):
     """Test complete learning cycles and improvements"""
     
     def setUp(self):
-        """Set up test with reproducible random seed"""
+        """Set up test with a reproducible, test-local RNG"""
         self.random_seed = 87
-        random.seed(self.random_seed)
+        self.rng = random.Random(self.random_seed)
     
     def test_full_learning_cycle(self):
         """Test a complete learning cycle with multiple subjects"""
@@ -21,12 +25,13 @@ class TestEndToEnd(unittest.TestCase):
         subjects = ["weather.rain", "stock.price_up", "traffic.heavy"]
         sources = ["NOAA", "Bloomberg", "Waze", "LocalNews", "Expert"]
         
-        # Phase 1: Initial ingestion
-        for i in range(30):
-            subject = random.choice(subjects)
-            source = random.choice(sources)
-            label = random.choice([0, 1])
-            agent.ingest(subject, info={"iteration": i}, label=label, source_names=[source])
+        # Phase 1: Initial ingestion (draw all random inputs up front, ingest in one batch)
+        n = 30
+        batch_subjects = self.rng.choices(subjects, k=n)
+        batch_sources = [[source] for source in self.rng.choices(sources, k=n)]
+        labels = self.rng.choices([0, 1], k=n)
+        infos = [{"iteration": i} for i in range(n)]
+        agent.ingest_batch(batch_subjects, infos, labels, batch_sources)
         
         # Phase 2: Make predictions
         predictions = []
@@ -36,8 +41,7 @@ class TestEndToEnd(unittest.TestCase):
                 predictions.append((subject, idx))
         
         # Phase 3: Resolve predictions
-        for subject, idx in predictions:
-            observed = random.choice([0, 1])
+        for (subject, idx), observed in zip(predictions, self.rng.choices([0, 1], k=len(predictions))):
             agent.resolve_prediction(idx, observed)
         
         # Verify system state
@@ -54,31 +58,29 @@ class TestEndToEnd(unittest.TestCase):
         sources = ["Source1", "Source2", "Source3"]
         
         # Initial phase: Random labels (low accuracy expected)
-        for i in range(20):
-            label = random.choice([0, 1])
-            agent.ingest(subject, info={}, label=label, source_names=[random.choice(sources)])
+        agent.ingest_batch([subject] * 20, None, self.rng.choices([0, 1], k=20),
+                           [[source] for source in self.rng.choices(sources, k=20)])
         
         # Make predictions and resolve
         initial_predictions = []
         for _ in range(10):
             if agent.can_predict_external(subject):
                 idx = agent.predict(subject, scenario={}, evidence_hint=None, own=False)
-                observed = random.choice([0, 1])
+                observed = self.rng.choice([0, 1])
                 agent.resolve_prediction(idx, observed)
                 initial_predictions.append(agent.predictor.history[idx].correct)
         
         # Continue learning with more consistent patterns
-        for i in range(30):
-            # Introduce some pattern (70% label=1)
-            label = 1 if random.random() < 0.7 else 0
-            agent.ingest(subject, info={}, label=label, source_names=[random.choice(sources)])
+        # Introduce some pattern (70% label=1)
+        agent.ingest_batch([subject] * 30, None, self.rng.choices([1, 0], weights=[0.7, 0.3], k=30),
+                           [[source] for source in self.rng.choices(sources, k=30)])
         
         # Make more predictions
         later_predictions = []
         for _ in range(10):
             if agent.can_predict_external(subject):
                 idx = agent.predict(subject, scenario={}, evidence_hint=None, own=False)
-                observed = 1 if random.random() < 0.7 else 0  # Match pattern
+                observed = 1 if self.rng.random() < 0.7 else 0  # Match pattern
                 agent.resolve_prediction(idx, observed)
                 later_predictions.append(agent.predictor.history[idx].correct)
         
@@ -111,8 +113,8 @@ class TestEndToEnd(unittest.TestCase):
         
         # Check pattern stats
         stats = agent.pattern_stats[subject]
-        self.assertGreater(stats["disagreements"], 0)
-        ratio = stats["disagreements"] / stats["events"]
+        self.assertGreater(stats.disagreements, 0)
+        ratio = stats.disagreements / stats.events
         self.assertGreater(ratio, 0.3)  # Should exceed warning threshold
     
     def test_replay_buffer_bounds(self):
@@ -129,6 +131,256 @@ class TestEndToEnd(unittest.TestCase):
         # Replay buffer should be bounded
         self.assertLessEqual(len(agent.replay), S_rules.replay_buffer_size)
     
+    def test_replay_merges_duplicates(self):
+        """Test that repeated identical events share one replay entry"""
+        agent = ContinuousLearner(enable_logging=False, enable_checkpoints=False)
+        for i in range(20):
+            agent.ingest("merge.subject", info={}, label=i % 2, source_names=["S1"])
+
+        self.assertEqual(len(agent.replay), 2)  # one entry per distinct label
+        self.assertEqual(sorted(m.count for m in agent.replay), [10, 10])
+        self.assertEqual(agent.pattern_stats["merge.subject"].events, 20)
+
+        sample = agent.replay.sample(50, rng=self.rng)
+        self.assertEqual(len(sample), 50)
+        self.assertTrue(all(m.subject == "merge.subject" for m in sample))
+
+    def test_replay_evicts_stalest(self):
+        """Test that the replay map evicts the least recently seen entry past maxlen"""
+        replay = ReplayMap(maxlen=3)
+        for subject in ("a", "b", "c"):
+            replay.append(ReplayEvent(kind="ingest", subject=subject, label=1.0))
+        replay.append(ReplayEvent(kind="ingest", subject="a", label=1.0))  # merge refreshes "a"
+        replay.append(ReplayEvent(kind="ingest", subject="d", label=1.0))  # evicts "b"
+
+        self.assertEqual([m.subject for m in replay], ["c", "a", "d"])
+        self.assertEqual([m.count for m in replay], [1, 2, 1])
+
+        for i in range(10):
+            replay.append(ReplayEvent(kind="ingest", subject=f"new_{i}", label=1.0))
+        self.assertEqual([m.subject for m in replay], ["new_7", "new_8", "new_9"])
+
+    def test_distinct_source_cardinality(self):
+        """Test that distinct sources are exact up to the limit, then a bounded-error estimate"""
+        agent = ContinuousLearner(enable_logging=False, enable_checkpoints=False)
+        limit = SourceCardinality.EXACT_LIMIT
+        names = [[f"S{i}"] for i in range(limit)]
+        agent.ingest_batch(["card"] * limit, None, [1] * limit, names)
+        distinct = agent.progress["card"].distinct_sources
+        self.assertEqual(len(distinct), limit)
+        agent.ingest_batch(["card"] * limit, None, [1] * limit, names)  # known ids
+        self.assertEqual(len(distinct), limit)
+
+        n = 200
+        names = [[f"S{i}"] for i in range(n)]
+        agent.ingest_batch(["card"] * n, None, [1] * n, names)
+        estimate = len(distinct)
+        self.assertLess(abs(estimate - n) / n, 0.39)  # within 3 std. errors (~13% each)
+        agent.ingest_batch(["card"] * n, None, [1] * n, names)  # known ids
+        self.assertEqual(len(distinct), estimate)
+
+    def test_gk_converged_blend_skip(self):
+        """Test that converged subjects skip the EWMA blend but still move on new evidence"""
+        gk = GeneralizedKnowledge()
+        for _ in range(100):
+            gk.update_with_observation("gk.subject", 1)
+        entry = gk.per_subject["gk.subject"]
+        converged, budget = gk.prior("gk.subject"), entry.skip_budget
+        self.assertLess(1 - converged, GeneralizedKnowledge.STABLE_EPS)
+        self.assertGreater(budget, 0)
+
+        gk.update_with_observation("gk.subject", 1)
+        self.assertEqual(gk.prior("gk.subject"), converged)  # blend skipped
+        self.assertEqual(entry.count, 101)
+        self.assertEqual(entry.skip_budget, budget - 1)
+
+        gk.update_with_observation("gk.subject", 0)  # far from the prior: blended in
+        self.assertAlmostEqual(gk.prior("gk.subject"), (1 - entry.ewma_alpha) * converged)
+        self.assertEqual(entry.skip_budget, GeneralizedKnowledge.SKIP_BUDGET)
+
+        batch = GeneralizedKnowledge()
+        batch.update_batch("gk.subject", [1.0] * 101 + [0.0])
+        self.assertEqual(batch.prior("gk.subject"), gk.prior("gk.subject"))
+
+    def test_prediction_history_view(self):
+        """Test that prediction history records reflect resolution state"""
+        agent = ContinuousLearner(enable_logging=False, enable_checkpoints=False)
+        for i in range(5):
+            agent.ingest("view.subject", info={}, label=1, source_names=["S1"])
+        
+        idx = agent.predict("view.subject", scenario={"k": 1}, evidence_hint=0.9, own=False)
+        rec = agent.predictor.history[idx]
+        self.assertFalse(rec.resolved)
+        self.assertIsNone(rec.correct)
+        self.assertIsNone(rec.brier)
+        
+        agent.resolve_prediction(idx, 1)
+        rec = agent.predictor.history[idx]
+        self.assertTrue(rec.resolved)
+        self.assertTrue(rec.correct)
+        self.assertAlmostEqual(rec.brier, (rec.prob - 1) ** 2)
+        self.assertEqual(rec.scenario, {"k": 1})
+    
+    def test_resolve_float_outcome(self):
+        """Test that float outcomes resolve like ints and invalid ones change nothing"""
+        agent = ContinuousLearner(enable_logging=False, enable_checkpoints=False)
+        for i in range(5):
+            agent.ingest("float.subject", info={}, label=1, source_names=["S1"])
+
+        idx = agent.predict("float.subject", scenario={}, evidence_hint=0.9, own=False)
+        with self.assertRaises(ValueError):
+            agent.resolve_prediction(idx, 0.5)
+        self.assertFalse(agent.predictor.history[idx].resolved)
+        self.assertEqual(agent.predictor.resolved_count, 0)
+
+        agent.resolve_prediction(idx, 1.0)
+        rec = agent.predictor.history[idx]
+        self.assertTrue(rec.resolved)
+        self.assertTrue(rec.correct)
+        self.assertAlmostEqual(rec.brier, (rec.prob - 1) ** 2)
+        self.assertEqual(agent.predictor.resolved_count, 1)
+
+    def test_resolve_batch_matches_sequential(self):
+        """Test that batch resolution matches resolving predictions one by one"""
+        agents = []
+        for _ in range(2):
+            agent = ContinuousLearner(enable_logging=False, enable_checkpoints=False)
+            for i in range(6):
+                agent.ingest("batch.resolve", info={}, label=i % 3 == 0, source_names=["S1"])
+            indices = [agent.predict("batch.resolve", scenario={}, evidence_hint=hint, own=False)
+                       for hint in (0.1, 0.4, 0.6, 0.9)]
+            agents.append(agent)
+        seq, batch = (agent.predictor for agent in agents)
+        observed = [0, 1, 1, 0]
+
+        for idx, obs in zip(indices, observed):
+            seq.resolve(idx, obs)
+        self.assertEqual(batch.resolve_batch(indices, observed), 4)
+        self.assertEqual(batch.resolve_batch(indices[:2], observed[:2]), 0)  # already resolved
+
+        self.assertEqual(batch.resolved_count, seq.resolved_count)
+        self.assertEqual(batch.correct_count, seq.correct_count)
+        self.assertAlmostEqual(batch.mean_brier(), seq.mean_brier())
+        self.assertAlmostEqual(batch.lifetime_mean_brier(), seq.lifetime_mean_brier())
+        self.assertAlmostEqual(batch.calibration_bonus, seq.calibration_bonus)
+        for idx in indices:
+            self.assertEqual(batch.history[idx].correct, seq.history[idx].correct)
+            self.assertAlmostEqual(batch.history[idx].brier, seq.history[idx].brier)
+
+    def test_resolve_batch_rejects_bad_input(self):
+        """Test that a batch with an evicted index or a length mismatch resolves nothing"""
+        agent = ContinuousLearner(enable_logging=False, enable_checkpoints=False)
+        agent.predictor.history = PredictionTable(capacity=2)
+        for i in range(5):
+            agent.ingest("batch.bad", info={}, label=1, source_names=["S1"])
+        indices = [agent.predict("batch.bad", scenario={}, evidence_hint=None, own=False)
+                   for _ in range(3)]  # indices[0] is evicted
+        predictor = agent.predictor
+
+        with self.assertRaises(IndexError):
+            predictor.resolve_batch([indices[1], indices[2], indices[0]], [1, 1, 1])
+        with self.assertRaises(ValueError):
+            predictor.resolve_batch(indices[1:], [1])
+        with self.assertRaises(ValueError):
+            predictor.resolve_batch(indices[1:], [1, 0.5])
+
+        self.assertFalse(any(predictor.history[idx].resolved for idx in indices[1:]))
+        self.assertEqual(predictor.resolved_count, 0)
+        self.assertEqual(predictor.resolve_batch(indices[1:], [1, 0]), 2)
+        self.assertEqual(predictor.resolved_count, 2)
+
+    def test_prediction_history_bounded(self):
+        """Test that prediction history keeps only the most recent rows"""
+        agent = ContinuousLearner(enable_logging=False, enable_checkpoints=False)
+        agent.predictor.history = PredictionTable(capacity=4)
+        for i in range(5):
+            agent.ingest("bounded", info={}, label=1, source_names=["S1"])
+        
+        indices = [agent.predict("bounded", scenario={"n": n}, evidence_hint=None, own=False)
+                   for n in range(10)]
+        self.assertEqual(indices, list(range(10)))
+        self.assertEqual(len(agent.predictor.history), 4)
+        self.assertEqual(agent.predictor.history.total, 10)
+        self.assertEqual(agent.predictor.history[9].scenario, {"n": 9})
+        
+        agent.resolve_prediction(9, 1)
+        self.assertEqual(agent.predictor.resolved_count, 1)
+        with self.assertRaises(IndexError):
+            agent.resolve_prediction(0, 1)  # evicted
+    
+    def test_claim_table_view(self):
+        """Test that stored claims read back with their original fields"""
+        agent = ContinuousLearner(enable_logging=False, enable_checkpoints=False)
+        agent.ingest("claims.a", info={"n": 1}, label=1, source_names=["S1", "S2", "S1"])
+        agent.ingest("claims.b", info=None, label=None, source_names=[])
+
+        self.assertEqual(len(agent.kb.claims), 2)
+        first, last = agent.kb.claims[0], agent.kb.claims[-1]
+        self.assertEqual(first.info, {"n": 1})
+        self.assertEqual(first.label, 1)
+        self.assertEqual(len(first.source_ids), 2)
+        self.assertIsNone(last.label)
+        self.assertEqual(last.source_ids, [])
+        self.assertEqual([c.subject for c in agent.kb.subject_items("claims.a")], ["claims.a"])
+
+    def test_ingest_batch_matches_sequential(self):
+        """Test that batch ingestion yields the same learned state as single ingests"""
+        subjects = [f"subject_{i%3}" for i in range(40)]
+        labels = self.rng.choices([0, 1], k=len(subjects))
+        sources = [[f"S{i%4}"] for i in range(40)]
+        infos = [{} for _ in subjects]
+        
+        seq = ContinuousLearner(enable_logging=False, enable_checkpoints=False)
+        for subject, info, label, names in zip(subjects, infos, labels, sources):
+            seq.ingest(subject, info=info, label=label, source_names=names)
+        
+        batch = ContinuousLearner(enable_logging=False, enable_checkpoints=False)
+        self.assertEqual(batch.ingest_batch(subjects, infos, labels, sources), 40)
+        
+        self.assertEqual(batch.event_count, seq.event_count)
+        self.assertEqual(len(batch.kb.claims), len(seq.kb.claims))
+        self.assertAlmostEqual(batch.total_reward, seq.total_reward)
+        for subject in set(subjects):
+            self.assertAlmostEqual(batch.gk.prior(subject), seq.gk.prior(subject))
+            self.assertEqual(batch.progress[subject].seen_items, seq.progress[subject].seen_items)
+            self.assertAlmostEqual(batch.progress[subject].completion_percent,
+                                   seq.progress[subject].completion_percent)
+            self.assertEqual(batch.pattern_stats[subject].disagreements,
+                             seq.pattern_stats[subject].disagreements)
+        self.assertEqual(batch.sources.name_to_id, seq.sources.name_to_id)
+        self.assertEqual([(c.subject, c.label, c.source_ids) for c in batch.kb.claims],
+                         [(c.subject, c.label, c.source_ids) for c in seq.kb.claims])
+        self.assertEqual([(e.subject, e.label) for e in batch.replay],
+                         [(e.subject, e.label) for e in seq.replay])
+        # Reflection still triggered once the interval was crossed
+        self.assertEqual(batch.last_reeval_event, batch.event_count)
+        
+        self.assertEqual(batch.ingest_batch(["a", "b"], None, [1, None], [["S0"], []]), 2)
+        self.assertIsNone(batch.kb.claims[-1].info)
+        
+        with self.assertRaises(ValueError):
+            batch.ingest_batch(["a"], [], [1], [["S0"]])
+    
+    def test_reflection_deferred_by_wall_time(self):
+        """Test that reflection waits for reevaluation_min_interval_sec unless events pile up"""
+        rules = dataclasses.replace(S_rules, reevaluation_min_interval_sec=3600.0,
+                                    reevaluation_max_defer_factor=3)
+        interval = rules.reevaluation_interval_events
+        with mock.patch.object(CLAIP, "S_rules", rules):
+            agent = ContinuousLearner(enable_logging=False, enable_checkpoints=False)
+            agent.ingest_batch(["defer"] * interval, None, [1] * interval, [["S1"]] * interval)
+            self.assertEqual(agent.last_reeval_event, 0)  # interval reached, too little wall time
+
+            # Forced once interval * max_defer_factor events are pending
+            n = interval * (rules.reevaluation_max_defer_factor - 1)
+            agent.ingest_batch(["defer"] * n, None, [1] * n, [["S1"]] * n)
+            self.assertEqual(agent.last_reeval_event, agent.event_count)
+
+            # Runs at the normal interval once enough wall time has passed
+            agent._last_reeval_ts -= rules.reevaluation_min_interval_sec
+            agent.ingest_batch(["defer"] * interval, None, [1] * interval, [["S1"]] * interval)
+            self.assertEqual(agent.last_reeval_event, agent.event_count)
+
     def test_metrics_reporting(self):
         """Test that metrics are generated correctly"""
         agent = ContinuousLearner(enable_logging=False, enable_checkpoints=False)